@@ -0,0 +1,44 @@
+# benchmarks/bench_candidates.py
+#
+# Timing for nurse x shift candidate generation with preference flagging.
+# Usage: python -m benchmarks.bench_candidates [--nurses 500 --shifts 5000]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.candidates import generate_candidates
+
+def make_preferences(n_nurses, n_shifts, prefs_per_nurse=28, seed=0):
+    """Preference rows drawn from n_shifts distinct (date, shift, ward, time) slots."""
+    rng = np.random.default_rng(seed)
+    slots = pd.DataFrame({
+        'date': pd.Timestamp('2025-09-08') + pd.to_timedelta(np.arange(n_shifts) // 20, unit='D'),
+        'shift': [f"S{i % 5}" for i in range(n_shifts)],
+        'ward': [f"W{(i // 5) % 4}" for i in range(n_shifts)],
+        'start_time': '07:00',
+        'end_time': '15:00',
+        'duration_hours': 8,
+    })
+    nurses = np.array([f"N{i:04d}" for i in range(n_nurses)], dtype=object)
+    picks = rng.integers(0, n_shifts, n_nurses * prefs_per_nurse)
+    pref_df = slots.iloc[picks].reset_index(drop=True)
+    pref_df.insert(0, 'nurse_id', np.repeat(nurses, prefs_per_nurse))
+    # Make sure every slot appears at least once so the window has n_shifts shifts
+    pref_df = pd.concat([pref_df, slots.assign(nurse_id=nurses[0])], ignore_index=True)
+    return nurses, pref_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nurses', type=int, default=500)
+    parser.add_argument('--shifts', type=int, default=5000)
+    args = parser.parse_args()
+
+    nurses, pref_df = make_preferences(args.nurses, args.shifts)
+    start = time.perf_counter()
+    candidate_df = generate_candidates(nurses, pref_df)
+    elapsed = time.perf_counter() - start
+    print(f"{len(candidate_df):,} candidate edges "
+          f"({candidate_df['is_preferred'].sum():,} preferred) in {elapsed:.3f}s")
@@ -0,0 +1,61 @@
+# benchmarks/bench_feature_engineering.py
+#
+# Scaling benchmark for the sort-based history feature engine.
+# Usage: python -m benchmarks.bench_feature_engineering [--sizes 10000 100000 ...]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.feature_engineering import (
+    add_history_features,
+    add_total_hours_in_fortnight,
+    add_days_since_last_shift,
+    add_consecutive_work_days,
+    HISTORY_FEATURES,
+)
+
+def make_history(n_rows, rows_per_nurse=250, seed=0):
+    """Random assignment history: ~rows_per_nurse shifts per nurse over one year."""
+    rng = np.random.default_rng(seed)
+    n_nurses = max(1, n_rows // rows_per_nurse)
+    df = pd.DataFrame({
+        'nurse_id': pd.Series(rng.integers(0, n_nurses, n_rows)).map(lambda i: f"N{i:06d}"),
+        'date': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+        'duration_hours': rng.choice([4, 5, 6, 7, 8], n_rows),
+        'label': 1,
+    })
+    return df
+
+def check_against_legacy(n_rows=1000, seed=1):
+    """Assert the engine reproduces the per-row implementations on a small history."""
+    df = make_history(n_rows, rows_per_nurse=50, seed=seed)
+    legacy = df.copy()
+    legacy = add_total_hours_in_fortnight(legacy, df)
+    legacy = add_days_since_last_shift(legacy, df)
+    legacy = add_consecutive_work_days(legacy, df)
+    fast = add_history_features(df.copy(), df)
+    for col in HISTORY_FEATURES:
+        pd.testing.assert_series_equal(legacy[col], fast[col])
+    print(f"Engine output matches legacy features on {n_rows} rows")
+
+def run(sizes):
+    print(f"{'rows':>12} {'seconds':>10} {'rows/s':>14}")
+    for n_rows in sizes:
+        df = make_history(n_rows)
+        start = time.perf_counter()
+        add_history_features(df, df)
+        elapsed = time.perf_counter() - start
+        print(f"{n_rows:>12,} {elapsed:>10.3f} {n_rows / elapsed:>14,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--skip-check', action='store_true')
+    args = parser.parse_args()
+    if not args.skip_check:
+        check_against_legacy()
+    run(args.sizes)
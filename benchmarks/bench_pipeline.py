@@ -0,0 +1,149 @@
+# benchmarks/bench_pipeline.py
+#
+# End-to-end scaling benchmark: every runner stage (features, candidates, graph, train,
+# predict, postprocess, solve, metrics) on seeded synthetic rosters of increasing size,
+# compared against the recorded baselines in benchmarks/baselines.json.
+# Usage: python -m benchmarks.bench_pipeline [--nurses 40 80 160] [--update-baselines]
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from src.runner import PipelineRunner
+from src.utils.profiling import StageProfiler
+from src.utils.synthetic import generate_roster, write_roster
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Record fields that depend on the run, not on the code
+SKIPPED_FIELDS = {'pid', 'started_at', 'key', 'cached', 'profile'}
+
+def bench_config(base_cfg, data_dir, wards, settings):
+    """base_cfg with every path under data_dir and the benchmark's model/solver settings."""
+    cfg = copy.deepcopy(base_cfg)
+    cfg['paths'] = {
+        'data_dir': data_dir,
+        'combined_csv': os.path.join(data_dir, "combined.csv"),
+        'preference_csv': os.path.join(data_dir, "preference.csv"),
+        'feature_store': os.path.join(data_dir, "feature_store.sqlite"),
+        'edge_scores': os.path.join(data_dir, "edges_with_scores.npy"),
+        'checkpoint_dir': os.path.join(data_dir, "checkpoints"),
+        'cache_dir': os.path.join(data_dir, "cache"),
+    }
+    cfg['model']['gat_epochs'] = settings['epochs']
+    cfg['solver']['backend'] = settings['backend']
+    cfg['solver']['time_limit_s'] = settings['time_limit_s']
+    cfg['ward_requirements'] = {ward: settings['staff_per_slot'] for ward in wards}
+    cfg['io']['export_csv'] = False
+    return cfg
+
+def run_size(base_cfg, n_nurses, settings):
+    """
+    All stages for one roster size, in a fresh process (see main) so peak RSS belongs to
+    this size alone. Peak RSS is the process high-water mark, so it never drops between stages.
+    """
+    n_wards = max(1, n_nurses // settings['nurses_per_ward'])
+    combined_df, pref_df = generate_roster(
+        n_nurses=n_nurses,
+        wards=n_wards,
+        horizon_days=settings['horizon_days'],
+        preference_density=settings['preference_density'],
+        seed=settings['seed']
+    )
+    with tempfile.TemporaryDirectory(prefix=f"bench_{n_nurses}_") as data_dir:
+        write_roster(combined_df, pref_df, data_dir)
+        cfg = bench_config(base_cfg, data_dir, sorted(combined_df['ward'].unique()), settings)
+        profiler = StageProfiler()
+        PipelineRunner(cfg, profiler=profiler).run('metrics')
+    return {
+        record['stage']: {field: value for field, value in record.items()
+                          if field not in SKIPPED_FIELDS and field != 'stage'}
+        for record in profiler.records
+    }
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+def compare(results, baselines, tolerance, min_delta_s):
+    """Print stage timings against the baselines; returns the (size, stage) pairs that regressed."""
+    regressions = []
+    print(f"{'nurses':>7} {'stage':<12} {'wall s':>9} {'baseline':>9} {'ratio':>6} {'peak MB':>8} {'baseline':>9}")
+    for size, stages in results.items():
+        for stage, record in stages.items():
+            base = baselines.get(size, {}).get(stage, {})
+            wall, base_wall = record['wall_s'], base.get('wall_s')
+            rss, base_rss = record['process_peak_rss_mb'], base.get('process_peak_rss_mb')
+            slower = base_wall is not None and wall > base_wall * (1 + tolerance) and wall - base_wall > min_delta_s
+            bigger = base_rss is not None and rss is not None and rss > base_rss * (1 + tolerance)
+            if slower or bigger:
+                regressions.append((size, stage))
+            ratio = f"{wall / base_wall:.2f}" if base_wall else "-"
+            print(f"{size:>7} {stage:<12} {wall:>9.2f} {_fmt(base_wall, '.2f'):>9} {ratio:>6} "
+                  f"{_fmt(rss, '.0f'):>8} {_fmt(base_rss, '.0f'):>9}{'  REGRESSION' if slower or bigger else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', default="config.yaml", help="base config; paths are replaced")
+    parser.add_argument('--nurses', type=int, nargs='+', default=[40, 80, 160])
+    parser.add_argument('--nurses-per-ward', type=int, default=10)
+    parser.add_argument('--staff-per-slot', type=int, default=2)
+    parser.add_argument('--horizon-days', type=int, default=28)
+    parser.add_argument('--preference-density', type=float, default=1.0)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--backend', default='scip', choices=['scip', 'cpsat'])
+    parser.add_argument('--time-limit-s', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative slowdown / RSS growth before a stage counts as regressed")
+    parser.add_argument('--min-delta-s', type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many seconds (timer noise)")
+    parser.add_argument('--update-baselines', action='store_true',
+                        help="store this run's results as the new baselines")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        base_cfg = yaml.safe_load(f)
+    settings = {
+        'nurses_per_ward': args.nurses_per_ward,
+        'staff_per_slot': args.staff_per_slot,
+        'horizon_days': args.horizon_days,
+        'preference_density': args.preference_density,
+        'epochs': args.epochs,
+        'backend': args.backend,
+        'time_limit_s': args.time_limit_s,
+        'seed': args.seed,
+    }
+
+    results = {}
+    for n_nurses in args.nurses:
+        print(f"[bench] {n_nurses} nurses")
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[str(n_nurses)] = pool.submit(run_size, base_cfg, n_nurses, settings).result()
+
+    baselines = {'settings': settings, 'sizes': {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+        if baselines['settings'] != settings:
+            print(f"[bench] warning: baseline settings {baselines['settings']} differ from this run's")
+    regressions = compare(results, baselines['sizes'], args.tolerance, args.min_delta_s)
+
+    if args.update_baselines:
+        baselines['settings'] = settings
+        baselines['sizes'].update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True, default=str)
+        print(f"[bench] baselines written to {args.baselines}")
+    elif regressions:
+        print(f"[bench] {len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}: {regressions}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
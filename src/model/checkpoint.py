@@ -0,0 +1,56 @@
+# src/model/checkpoint.py
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+import torch
+
+def config_hash(cfg):
+    """Stable short hash of a JSON-serialisable config dict."""
+    payload = json.dumps(cfg, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+def data_hash(df):
+    """Content hash of a DataFrame (row order and values, index ignored)."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+
+def _versions(checkpoint_dir):
+    found = {}
+    for path in glob.glob(os.path.join(checkpoint_dir, "gat_v*.pt")):
+        match = re.search(r"gat_v(\d+)\.pt$", path)
+        if match:
+            found[int(match.group(1))] = path
+    return found
+
+def save_checkpoint(checkpoint_dir, model, optimizer, meta):
+    """
+    Write the next versioned checkpoint (gat_v0001.pt, gat_v0002.pt, ...) holding the
+    model and optimizer state_dicts plus meta (model_args, config_hash, data_hash, ...).
+    Returns the path written.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    version = max(_versions(checkpoint_dir), default=0) + 1
+    path = os.path.join(checkpoint_dir, f"gat_v{version:04d}.pt")
+    torch.save({
+        'version': version,
+        'model_state': model.state_dict(),
+        'optimizer_state': optimizer.state_dict(),
+        **meta,
+    }, path)
+    print(f"[checkpoint] Saved {path}")
+    return path
+
+def load_latest_checkpoint(checkpoint_dir):
+    """Latest checkpoint dict in checkpoint_dir, or None if there is none."""
+    versions = _versions(checkpoint_dir)
+    if not versions:
+        return None
+    path = versions[max(versions)]
+    checkpoint = torch.load(path, weights_only=True)
+    print(f"[checkpoint] Loaded {path}")
+    return checkpoint
@@ -0,0 +1,229 @@
+# src/model/evaluation.py
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+import yaml
+
+from src.preprocessing.candidates import SHIFT_KEY, generate_candidates
+from src.preprocessing.feature_engineering import add_history_features
+from src.preprocessing.graphconstruction import build_graph
+from src.preprocessing.traintestsplit import split_schedule_and_preferences
+from src.model.model import train_gat, predict_gat
+from src.utils.io import write_table
+
+# Model settings a variant may override (defaults come from config.yaml's model section)
+VARIANT_KEYS = ('gat_hidden_dim', 'gat_heads', 'gat_epochs', 'gat_lr', 'use_edge_features', 'batch_size', 'num_neighbors')
+
+def ranking_metrics(scores, labels, shift_codes, nurse_codes, ks=(1, 3, 5), seed=0):
+    """
+    Per-shift ranking quality of edge scores, batched over all shifts at once.
+
+    Edges are scattered into a dense (shifts x nurses) score matrix (missing pairs score
+    -inf and are ignored), each row is sorted once, and from the sorted labels:
+      - hit@k: share of shifts with an assigned nurse among the top k
+      - mrr: mean reciprocal rank of the best-ranked assigned nurse
+      - auc: mean per-shift ROC AUC (Mann-Whitney from within-row average ranks, so tied
+        scores count half)
+    Tied scores are ordered by a seeded random permutation per shift for hit@k and mrr,
+    never by nurse order. Only shifts with at least one assigned nurse count (and, for
+    AUC, one unassigned one).
+    """
+    scores = torch.as_tensor(np.asarray(scores, dtype=np.float32))
+    labels = torch.as_tensor(np.asarray(labels, dtype=bool))
+    shift_codes = torch.as_tensor(np.asarray(shift_codes, dtype=np.int64))
+    nurse_codes = torch.as_tensor(np.asarray(nurse_codes, dtype=np.int64))
+    num_shifts, num_nurses = int(shift_codes.max()) + 1, int(nurse_codes.max()) + 1
+
+    score = torch.full((num_shifts, num_nurses), float('-inf'))
+    score[shift_codes, nurse_codes] = scores
+    label = torch.zeros((num_shifts, num_nurses), dtype=torch.bool)
+    label[shift_codes, nurse_codes] = labels
+    valid = torch.zeros((num_shifts, num_nurses), dtype=torch.bool)
+    valid[shift_codes, nurse_codes] = True
+
+    # Stable sort of randomly permuted rows: ties end up in random, not nurse, order
+    generator = torch.Generator().manual_seed(seed)
+    shuffle = torch.rand((num_shifts, num_nurses), generator=generator).argsort(dim=1)
+    order = shuffle.gather(1, score.gather(1, shuffle).argsort(dim=1, descending=True, stable=True))
+    ranked = label.gather(1, order)
+    positives = label.sum(dim=1)
+    negatives = valid.sum(dim=1) - positives
+    has_positive = positives > 0
+
+    first_hit = ranked.float().argmax(dim=1)
+    metrics = {f'hit@{k}': ranked[:, :k].any(dim=1)[has_positive].float().mean().item() for k in ks}
+    metrics['mrr'] = (1.0 / (first_hit[has_positive] + 1).float()).mean().item()
+
+    # Ascending average rank among a row's valid edges: an edge is beaten by the scores
+    # left of its tie group and shares the group's ranks; invalid (-inf) entries sort
+    # first and are subtracted
+    ascending = score.sort(dim=1).values
+    below = torch.searchsorted(ascending, score, side='left')
+    upto = torch.searchsorted(ascending, score, side='right')
+    invalid = (~valid).sum(dim=1, keepdim=True)
+    rank = (below + upto + 1).float() / 2 - invalid
+    rank_sum = (rank * label).sum(dim=1)
+    scored = has_positive & (negatives > 0)
+    p, n = positives[scored].float(), negatives[scored].float()
+    metrics['auc'] = ((rank_sum[scored] - p * (p + 1) / 2) / (p * n)).mean().item()
+    metrics['num_shifts'] = int(has_positive.sum())
+    return metrics
+
+def backtest_windows(dates, num_folds=4, test_days=7, min_train_days=28):
+    """
+    Consecutive test windows of test_days ending at the last date, most recent last. Each
+    fold trains on everything before its window; folds without min_train_days of history
+    before them are dropped.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).dt.normalize()
+    first, last = dates.min(), dates.max()
+    windows = []
+    for fold in range(num_folds, 0, -1):
+        start = last - pd.Timedelta(days=fold * test_days - 1)
+        if start - first < pd.Timedelta(days=min_train_days):
+            continue
+        windows.append(pd.date_range(start, periods=test_days, freq='D'))
+    return windows
+
+# Combined schedule and vocabularies, set once per worker process by _init_worker
+_df = None
+_vocab = None
+
+def _init_worker(df, vocab, threads):
+    global _df, _vocab
+    _df, _vocab = df, vocab
+    torch.set_num_threads(threads)
+
+def _run_fold(fold, test_dates, name, variant, seed, ks):
+    # Top-level so the process pool can pickle it; the schedule itself stays in the worker
+    start = time.perf_counter()
+    train_assigned, test_assigned, _, _ = split_schedule_and_preferences(_df, test_dates=test_dates)
+    # Rolling backtest: only history before the window is visible to the model
+    train_assigned = train_assigned[train_assigned['date'] < test_dates.min()].reset_index(drop=True)
+    train_assigned = add_history_features(train_assigned, train_assigned)
+
+    # Every nurse against every shift held in the window; the nurses who worked it are positives
+    # generate_candidates flags on (date, shift, ward) only, but shift nodes also split on
+    # start/end time, so labels are matched on the full shift key here
+    candidate_df = generate_candidates(_df['nurse_id'].unique(), test_assigned)
+    candidate_key = pd.MultiIndex.from_frame(candidate_df[['nurse_id'] + SHIFT_KEY])
+    candidate_df['label'] = candidate_key.isin(pd.MultiIndex.from_frame(test_assigned[['nurse_id'] + SHIFT_KEY])).astype(int)
+    candidate_df = add_history_features(candidate_df, train_assigned)
+
+    torch.manual_seed(seed)
+    train_graph, _ = build_graph(train_assigned, **_vocab)
+    test_graph, _ = build_graph(candidate_df, **_vocab)
+    model = train_gat(
+        train_graph,
+        in_dim=train_graph.x.shape[1],
+        hidden_dim=variant['gat_hidden_dim'],
+        out_dim=1,
+        heads=variant['gat_heads'],
+        epochs=variant['gat_epochs'],
+        lr=variant['gat_lr'],
+        edge_dim=train_graph.edge_attr.shape[1] if variant['use_edge_features'] else None,
+        batch_size=variant['batch_size'],
+        num_neighbors=variant['num_neighbors'],
+        verbose=False
+    )
+    scores = predict_gat(model, test_graph)
+    num_nurses = int(test_graph.edge_index[0].max()) + 1
+    metrics = ranking_metrics(
+        scores,
+        candidate_df['label'].to_numpy(),
+        test_graph.edge_index[1].numpy() - num_nurses,
+        test_graph.edge_index[0].numpy(),
+        ks=ks,
+        seed=seed
+    )
+    return {
+        'variant': name,
+        'fold': fold,
+        'test_start': str(test_dates.min().date()),
+        'train_rows': len(train_assigned),
+        'test_edges': len(candidate_df),
+        **metrics,
+        'wall_s': time.perf_counter() - start,
+    }
+
+def run_backtest(df, variants, num_folds=4, test_days=7, min_train_days=28, ks=(1, 3, 5), seed=0, max_workers=None):
+    """
+    Rolling time-split backtest of GAT variants on a combined schedule (combined.csv rows).
+
+    Every variant (a dict of VARIANT_KEYS, keyed by name) is trained and scored on every
+    fold from backtest_windows: split_schedule_and_preferences separates the window, the
+    model learns from the assignments before it and ranks all nurses for each shift in it
+    (see ranking_metrics). The variant x fold runs go to max_workers processes (default:
+    the CPU count), each with an even share of the torch threads; the schedule is handed
+    to each process once.
+
+    Returns (folds, summary): one row per variant and fold, and the per-variant means.
+    """
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    windows = backtest_windows(df.loc[df['label'] == 1, 'date'], num_folds, test_days, min_train_days)
+    if not windows:
+        raise ValueError(f"No fold has {min_train_days} days of history before a {test_days}-day window")
+    vocab = {'shift_types': sorted(df['shift'].unique()), 'wards': sorted(df['ward'].unique())}
+    tasks = [(fold, dates, name, variant) for name, variant in variants.items() for fold, dates in enumerate(windows)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(df, vocab, threads)) as pool:
+        futures = [pool.submit(_run_fold, fold, dates, name, variant, seed, ks) for fold, dates, name, variant in tasks]
+        folds = pd.DataFrame([future.result() for future in futures])
+
+    metric_cols = [f'hit@{k}' for k in ks] + ['mrr', 'auc']
+    summary = folds.groupby('variant', sort=False)[metric_cols + ['wall_s']].mean().reset_index()
+    print(f"[backtest] {len(variants)} variants x {len(windows)} folds in {max_workers} processes; "
+          f"wall {time.perf_counter() - start:.2f}s")
+    return folds, summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling backtest of GAT variants: Hit@k, MRR and AUC per shift.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--variants", default=None,
+                        help="YAML mapping name -> overrides of " + ", ".join(VARIANT_KEYS) + " (default: config only)")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--test-days", type=int, default=7)
+    parser.add_argument("--min-train-days", type=int, default=28)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="per-fold table path (default data/backtest.csv)")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    base = {key: cfg['model'][key] for key in VARIANT_KEYS}
+    overrides = {'config': {}}
+    if args.variants:
+        with open(args.variants, "r") as f:
+            overrides = {name: variant or {} for name, variant in yaml.safe_load(f).items()}
+    unknown = {key for variant in overrides.values() for key in variant} - set(VARIANT_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown variant settings {sorted(unknown)} (expected {VARIANT_KEYS})")
+    variants = {name: {**base, **variant} for name, variant in overrides.items()}
+
+    df = pd.read_csv(cfg['paths']['combined_csv'])
+    folds, summary = run_backtest(
+        df,
+        variants,
+        num_folds=args.folds,
+        test_days=args.test_days,
+        min_train_days=args.min_train_days,
+        max_workers=args.max_workers
+    )
+    output = args.output or os.path.join(cfg['paths']['data_dir'], "backtest.csv")
+    write_table(folds, output)
+    print(summary.to_string(index=False))
+    print(f"[backtest] per-fold results written to {output}")
+
+if __name__ == "__main__":
+    main()
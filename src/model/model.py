@@ -1,21 +1,39 @@
 # model.py
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from torch_geometric.nn import GATConv
 
+from src.model.checkpoint import save_checkpoint
+from src.model.sampling import EdgeNeighborLoader
+
 class SimpleGAT(torch.nn.Module):
-    def __init__(self, in_dim, hidden_dim, out_dim, heads):
+    """
+    Two-layer GAT. With edge_dim set, attention also conditions on data.edge_attr
+    (the engineered nurse-shift features from build_graph).
+    """
+    def __init__(self, in_dim, hidden_dim, out_dim, heads, edge_dim=None):
         super().__init__()
-        self.gat1 = GATConv(in_dim, hidden_dim, heads=heads)
-        self.gat2 = GATConv(hidden_dim * heads, out_dim, heads=1, concat=False)
+        self.edge_dim = edge_dim
+        self.gat1 = GATConv(in_dim, hidden_dim, heads=heads, edge_dim=edge_dim)
+        self.gat2 = GATConv(hidden_dim * heads, out_dim, heads=1, concat=False, edge_dim=edge_dim)
 
     def forward(self, data):
         x, edge_index = data.x, data.edge_index
-        x = F.elu(self.gat1(x, edge_index))
-        x = self.gat2(x, edge_index)
+        edge_attr = data.edge_attr if self.edge_dim is not None else None
+        x = F.elu(self.gat1(x, edge_index, edge_attr=edge_attr))
+        x = self.gat2(x, edge_index, edge_attr=edge_attr)
         return x
 
+def edge_logits(model, data, edge_label_index=None):
+    """Score edges (default: every edge in data) as the mean of their endpoint embeddings."""
+    if edge_label_index is None:
+        edge_label_index = data.edge_index
+    out = model(data)
+    edge_emb = (out[edge_label_index[0]] + out[edge_label_index[1]]) / 2
+    return edge_emb.squeeze(-1)
+
 def train_gat(
     data, 
     in_dim, 
@@ -24,35 +42,99 @@ def train_gat(
     heads, 
     epochs, 
     lr,
+    edge_dim=None,
+    batch_size=None,
+    num_neighbors=(10, 10),
+    num_workers=0,
+    checkpoint=None,
+    checkpoint_dir=None,
+    checkpoint_meta=None,
     verbose=True
 ):
     """
     Train GAT model on given data object.
-    Hyperparameters must be provided as arguments.
+    Hyperparameters must be provided as arguments; pass edge_dim=data.edge_attr.shape[1]
+    to use edge features.
+    batch_size=None trains full-batch. Otherwise each step sees batch_size target edges
+    and their sampled neighbourhood (see EdgeNeighborLoader), keeping memory bounded
+    regardless of graph size.
+    checkpoint warm-starts model and optimizer from a loaded checkpoint dict; with
+    checkpoint_dir the trained state is saved as a new versioned checkpoint carrying
+    checkpoint_meta (see src/model/checkpoint.py).
     """
-    model = SimpleGAT(in_dim, hidden_dim, out_dim, heads)
+    model = SimpleGAT(in_dim, hidden_dim, out_dim, heads, edge_dim=edge_dim)
     optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint['model_state'])
+        optimizer.load_state_dict(checkpoint['optimizer_state'])
+        for group in optimizer.param_groups:
+            group['lr'] = lr
+    loader = None
+    if batch_size is not None:
+        loader = EdgeNeighborLoader(
+            data,
+            num_neighbors=num_neighbors,
+            batch_size=batch_size,
+            shuffle=True,
+            num_workers=num_workers
+        )
     model.train()
     for epoch in range(epochs):
-        optimizer.zero_grad()
-        out = model(data)
-        edge_emb = (out[data.edge_index[0]] + out[data.edge_index[1]]) / 2
-        pred = edge_emb.squeeze()
-        loss = F.binary_cross_entropy_with_logits(pred, data.y)
-        loss.backward()
-        optimizer.step()
+        if loader is None:
+            optimizer.zero_grad()
+            pred = edge_logits(model, data)
+            loss = F.binary_cross_entropy_with_logits(pred, data.y)
+            loss.backward()
+            optimizer.step()
+        else:
+            total_loss, total_edges = 0.0, 0
+            for batch in loader:
+                optimizer.zero_grad()
+                pred = edge_logits(model, batch, batch.edge_label_index)
+                batch_loss = F.binary_cross_entropy_with_logits(pred, batch.edge_label)
+                batch_loss.backward()
+                optimizer.step()
+                total_loss += batch_loss.item() * batch.edge_label.numel()
+                total_edges += batch.edge_label.numel()
+            loss = torch.tensor(total_loss / max(total_edges, 1))
         if verbose and (epoch + 1) % 10 == 0:
             print(f"Epoch {epoch+1}: loss={loss.item():.4f}")
+    if checkpoint_dir is not None:
+        save_checkpoint(checkpoint_dir, model, optimizer, checkpoint_meta or {})
+    return model
+
+def load_gat(checkpoint):
+    """Rebuild a trained SimpleGAT from a checkpoint dict (see load_latest_checkpoint)."""
+    model = SimpleGAT(**checkpoint['model_args'])
+    model.load_state_dict(checkpoint['model_state'])
+    model.eval()
     return model
 
 @torch.no_grad()
-def predict_gat(model, data):
+def predict_gat(model, data, chunk_size=None, out_path=None):
     """
     Returns probabilities for each edge in the data object.
+    With chunk_size, node embeddings are computed once and edges are scored in blocks of
+    chunk_size, so only one block of edge activations is alive at a time. With out_path
+    (a .npy file), scores are streamed into a memory-mapped float32 array which is returned.
     """
     model.eval()
+    if chunk_size is None and out_path is None:
+        probs = torch.sigmoid(edge_logits(model, data))
+        return probs.cpu().numpy()
+
     out = model(data)
-    edge_emb = (out[data.edge_index[0]] + out[data.edge_index[1]]) / 2
-    logits = edge_emb.squeeze()
-    probs = torch.sigmoid(logits)
-    return probs.cpu().numpy()
\ No newline at end of file
+    edge_index = data.edge_index
+    num_edges = edge_index.size(1)
+    chunk_size = chunk_size or num_edges
+    if out_path is not None:
+        probs = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float32, shape=(num_edges,))
+    else:
+        probs = np.empty(num_edges, dtype=np.float32)
+    for start in range(0, num_edges, chunk_size):
+        block = edge_index[:, start:start + chunk_size]
+        edge_emb = (out[block[0]] + out[block[1]]) / 2
+        probs[start:start + block.size(1)] = torch.sigmoid(edge_emb.squeeze(-1)).cpu().numpy()
+    if out_path is not None:
+        probs.flush()
+    return probs
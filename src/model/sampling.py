@@ -0,0 +1,75 @@
+# src/model/sampling.py
+
+import torch
+from torch_geometric.data import Data
+
+class EdgeNeighborLoader(torch.utils.data.DataLoader):
+    """
+    Mini-batches of target edges with a sampled in-neighbourhood around their endpoints,
+    in the spirit of torch_geometric's LinkNeighborLoader but pure torch (no pyg-lib or
+    torch-sparse needed).
+
+    Each batch is a Data subgraph with local x, edge_index, edge_attr plus
+    edge_label_index (2 x batch_size, local node ids) and edge_label for the targets.
+    num_neighbors[i] caps the incoming edges sampled per node at hop i + 1, so batch size
+    and memory are bounded by batch_size * prod(num_neighbors), not by the graph size.
+    """
+    def __init__(self, data, num_neighbors=(10, 10), batch_size=1024, shuffle=True, num_workers=0, **kwargs):
+        self.data = data
+        self.num_neighbors = list(num_neighbors)
+        # CSC layout: incoming edges of node v are in_perm[in_ptr[v]:in_ptr[v + 1]]
+        dst = data.edge_index[1]
+        self.in_perm = torch.argsort(dst, stable=True)
+        counts = torch.bincount(dst, minlength=data.num_nodes)
+        self.in_ptr = torch.cat([torch.zeros(1, dtype=torch.long), torch.cumsum(counts, 0)])
+        super().__init__(
+            range(data.edge_index.size(1)),
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=num_workers,
+            collate_fn=self.sample,
+            **kwargs
+        )
+
+    def _sample_in_edges(self, nodes, fanout):
+        """Edge ids of up to `fanout` incoming edges per node (all of them if fanout < 0)."""
+        start = self.in_ptr[nodes]
+        deg = self.in_ptr[nodes + 1] - start
+        width = int(deg.max()) if fanout < 0 and len(deg) else fanout
+        if width <= 0:
+            return torch.empty(0, dtype=torch.long)
+        offsets = torch.arange(width).expand(len(nodes), width)
+        # Nodes with few neighbours keep all of them; the rest draw `fanout` at random
+        drawn = (torch.rand(len(nodes), width) * deg.unsqueeze(1)).long()
+        offsets = torch.where((deg <= width).unsqueeze(1), offsets, drawn)
+        valid = offsets < deg.unsqueeze(1)
+        return torch.unique(self.in_perm[(start.unsqueeze(1) + offsets)[valid]])
+
+    def sample(self, edge_ids):
+        edge_ids = torch.as_tensor(edge_ids, dtype=torch.long)
+        edge_index = self.data.edge_index
+        targets = edge_index[:, edge_ids]
+
+        # Expand hop by hop from the target endpoints along incoming edges
+        seen = torch.unique(targets.flatten())
+        frontier = seen
+        message_edges = [edge_ids]
+        for fanout in self.num_neighbors:
+            sampled = self._sample_in_edges(frontier, fanout)
+            message_edges.append(sampled)
+            sources = torch.unique(edge_index[0, sampled])
+            frontier = sources[~torch.isin(sources, seen)]
+            seen = torch.cat([seen, frontier])
+        message_edges = torch.unique(torch.cat(message_edges))
+
+        # Relabel global node ids to positions in the subgraph
+        nodes = torch.sort(seen).values
+        sub = Data(
+            x=self.data.x[nodes],
+            edge_index=torch.searchsorted(nodes, edge_index[:, message_edges]),
+            edge_label_index=torch.searchsorted(nodes, targets),
+            edge_label=self.data.y[edge_ids],
+        )
+        if self.data.edge_attr is not None:
+            sub.edge_attr = self.data.edge_attr[message_edges]
+        return sub
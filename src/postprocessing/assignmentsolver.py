@@ -1,80 +1,436 @@
 # src/postprocessing/assignmentsolver.py
 
+import time
+
 import pandas as pd
-from ortools.linear_solver import pywraplp
+from ortools.linear_solver.python import model_builder as mb
+from ortools.sat.python import cp_model
 import numpy as np
 
+from src.preprocessing.candidates import SHIFT_KEY
+from src.utils.io import read_table, write_table
+
+# Staff required for every (date, start_time, end_time) slot, per ward
+WARD_REQUIREMENTS = {'C': 4, 'B': 2, 'A': 1, 'ICU': 1}
+COVERAGE_KEY = ['date', 'start_time', 'end_time', 'ward']
+
+def plan_anchor(dates):
+    """Monday of the week holding the earliest date; week and fortnight blocks count from here."""
+    first = pd.to_datetime(dates).min().normalize()
+    return first - pd.Timedelta(days=first.dayofweek)
+
+def add_fortnights(df, anchor=None):
+    """
+    Add 'week' and 2-week 'fortnight' block columns used by the hour constraints, counted
+    in days from anchor (default: plan_anchor of df's dates) so plans crossing a year
+    boundary keep consecutive ids. Pass the same anchor to keep ids stable across windows.
+    """
+    dates = pd.to_datetime(df['date'])
+    if anchor is None:
+        anchor = plan_anchor(dates)
+    days = (dates - pd.Timestamp(anchor)).dt.days
+    df['week'] = days // 7
+    # Build "fortnight" blocks (each 2-week period)
+    df['fortnight'] = days // 14
+    return df
+
+def row_groups(df, cols):
+    """Positional row-index arrays, one per distinct value of df[cols]."""
+    return list(df.groupby(cols, sort=False, observed=True).indices.values())
+
+def constraint_groups(df, ward_requirements=None, hours_per_fortnight=10, hour_targets=None):
+    """
+    Row-index arrays shared by every backend:
+      - hour_groups: (rows, minimum hours) per (nurse_id, fortnight); the minimum is
+        hours_per_fortnight unless hour_targets (a Series indexed by (nurse_id, fortnight))
+        overrides it
+      - coverage_groups: (rows, required staff) per (date, start_time, end_time, ward) slot
+        whose ward has a requirement
+    """
+    if ward_requirements is None:
+        ward_requirements = WARD_REQUIREMENTS
+    groups = df.groupby(['nurse_id', 'fortnight'], sort=False, observed=True).indices
+    targets = np.full(len(groups), float(hours_per_fortnight))
+    if hour_targets is not None:
+        override = hour_targets.reindex(pd.MultiIndex.from_tuples(list(groups))).to_numpy()
+        targets = np.where(np.isnan(override), targets, override)
+    hour_groups = list(zip(groups.values(), targets))
+    required = df['ward'].map(ward_requirements).to_numpy()
+    coverage_groups = [
+        (rows, int(required[rows[0]]))
+        for rows in row_groups(df, COVERAGE_KEY)
+        if not pd.isna(required[rows[0]])
+    ]
+    return hour_groups, coverage_groups
+
+def objective_scores(df, preference_weight=0.0):
+    """Per-row objective weight: GAT score plus preference_weight for rows flagged is_preferred."""
+    scores = df['gat_score'].to_numpy(dtype=float)
+    if preference_weight and 'is_preferred' in df.columns:
+        scores = scores + preference_weight * df['is_preferred'].to_numpy(dtype=float)
+    return scores
+
+def build_assignment_model(
+    df,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    hour_targets=None,
+    hours_penalty=None,
+    preference_weight=0.0
+):
+    """
+    Build the assignment MIP from column arrays: one BoolVar per row, created in a single
+    loop (the only per-row Python), then objective and constraints as weighted sums over
+    precomputed group index arrays.
+    df needs nurse_id, date, ward, start_time, end_time, duration_hours, gat_score and fortnight.
+    With hours_penalty, minimum hours become soft: each missing hour costs hours_penalty.
+    preference_weight adds a bonus for requested shifts (see objective_scores).
+    Returns (model, x) where x is an object array of variables aligned with df rows.
+    """
+    scores = objective_scores(df, preference_weight)
+    hours = df['duration_hours'].to_numpy(dtype=float)
+    hour_groups, coverage_groups = constraint_groups(df, ward_requirements, hours_per_fortnight, hour_targets)
+
+    model = mb.Model()
+    # x[i] means assign the shift in row i (plain calls avoid new_bool_var_series' per-row Series lookups)
+    xs = np.array([model.new_bool_var(f"x_{i}") for i in range(len(df))], dtype=object)
+
+    # Objective: maximize total GAT score
+    objective = mb.LinearExpr.weighted_sum(xs, scores)
+
+    # Nurse hour constraints: minimum hours in every fortnight
+    shortfall = []
+    for rows, min_hours in hour_groups:
+        worked = mb.LinearExpr.weighted_sum(xs[rows], hours[rows])
+        if hours_penalty is None:
+            model.add(worked >= min_hours)
+        else:
+            missing = model.new_num_var(0, max(min_hours, 0), f"short_{len(shortfall)}")
+            model.add(worked + missing >= min_hours)
+            shortfall.append(missing)
+    if shortfall:
+        objective = objective - hours_penalty * mb.LinearExpr.sum(shortfall)
+    model.maximize(objective)
+
+    # Ward staffing constraints for every shift (point in time)
+    for rows, required in coverage_groups:
+        model.add(mb.LinearExpr.sum(xs[rows]) == required)
+
+    # (Optional) Each nurse can't overlap shifts (simplest form, no two shifts at same start time)
+    # for rows in row_groups(df, ['nurse_id', 'date', 'start_time']):
+    #     model.add(mb.LinearExpr.sum(xs[rows]) <= 1)
+    return model, xs
+
+def build_cpsat_model(
+    df,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    score_scale=1000,
+    hint=None,
+    hour_targets=None,
+    hours_penalty=None,
+    preference_weight=0.0
+):
+    """
+    CP-SAT version of build_assignment_model. CP-SAT needs integer coefficients, so GAT
+    scores are scaled by score_scale and rounded; fractional shift durations are counted
+    in minutes. hint (0/1 per row, e.g. a previous roster) seeds the search.
+    Returns (model, x).
+    """
+    scores = np.rint(objective_scores(df, preference_weight) * score_scale).astype(np.int64)
+    hours = df['duration_hours'].to_numpy(dtype=float)
+    hours_scale = 1 if np.all(hours == np.round(hours)) else 60
+    hours = np.rint(hours * hours_scale).astype(np.int64)
+    hour_groups, coverage_groups = constraint_groups(df, ward_requirements, hours_per_fortnight, hour_targets)
+
+    model = cp_model.CpModel()
+    xs = np.array([model.NewBoolVar(f"x_{i}") for i in range(len(df))], dtype=object)
+    objective = cp_model.LinearExpr.WeightedSum(list(xs), scores.tolist())
+    for rows, min_hours in hour_groups:
+        min_hours = int(np.ceil(min_hours * hours_scale))
+        worked = cp_model.LinearExpr.WeightedSum(list(xs[rows]), hours[rows].tolist())
+        if hours_penalty is None:
+            model.Add(worked >= min_hours)
+        else:
+            missing = model.NewIntVar(0, max(min_hours, 0), "")
+            model.Add(worked + missing >= min_hours)
+            objective -= int(round(hours_penalty * score_scale / hours_scale)) * missing
+    model.Maximize(objective)
+    for rows, required in coverage_groups:
+        model.Add(cp_model.LinearExpr.Sum(list(xs[rows])) == required)
+
+    if hint is not None:
+        for var, value in zip(xs, np.asarray(hint)):
+            model.AddHint(var, int(value))
+    return model, xs
+
+def _solve_mip(model, x, time_limit_s):
+    solver = mb.Solver('SCIP')
+    if time_limit_s is not None:
+        solver.set_time_limit_in_seconds(time_limit_s)
+    status = solver.solve(model)
+    found = status in (mb.SolveStatus.OPTIMAL, mb.SolveStatus.FEASIBLE)
+    result = {
+        'status': status.name,
+        'objective': solver.objective_value if found else None,
+        'best_bound': solver.best_objective_bound if found else None,
+    }
+    chosen = solver.values(x).to_numpy() > 0.5 if found else None
+    return chosen, result
+
+def _solve_cpsat(model, x, time_limit_s, num_workers, score_scale):
+    solver = cp_model.CpSolver()
+    if time_limit_s is not None:
+        solver.parameters.max_time_in_seconds = time_limit_s
+    solver.parameters.num_workers = num_workers
+    status = solver.Solve(model)
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    result = {
+        'status': solver.StatusName(status),
+        'objective': solver.ObjectiveValue() / score_scale if found else None,
+        'best_bound': solver.BestObjectiveBound() / score_scale if found else None,
+    }
+    chosen = np.array([solver.BooleanValue(var) for var in x]) if found else None
+    return chosen, result
+
+def optimize_assignment(
+    df,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    backend='scip',
+    time_limit_s=None,
+    num_workers=8,
+    score_scale=1000,
+    hint=None,
+    hour_targets=None,
+    hours_penalty=None,
+    preference_weight=0.0
+):
+    """
+    In-memory solve of the scored edge list. Returns (assignment_df, stats); assignment_df
+    is None if no solution was found.
+
+    backend='scip' solves the MIP through ModelBuilder; backend='cpsat' uses CP-SAT with
+    integer-scaled scores, num_workers parallel search workers and an optional hint.
+    hint only applies to CP-SAT; backend='scip' ignores it, so callers may pass one
+    regardless of backend.
+    With time_limit_s, the best FEASIBLE solution found in time is accepted and stats
+    reports its relative gap to the best bound. Build and solve time are reported separately.
+    hour_targets/hours_penalty override or soften the per-(nurse, fortnight) minimum hours
+    (see constraint_groups); an existing 'fortnight' column is kept so callers can share
+    fortnight ids across sub-problems. preference_weight rewards rows flagged is_preferred;
+    stats['objective'] still reports the plain GAT score sum, while stats['best_bound'] and
+    stats['gap'] refer to stats['model_objective'], the value the solver optimized.
+    """
+    df = df.reset_index(drop=True).copy()
+    if 'fortnight' not in df.columns:
+        df = add_fortnights(df)
+
+    start = time.perf_counter()
+    if backend == 'scip':
+        model, x = build_assignment_model(
+            df, hours_per_fortnight, ward_requirements, hour_targets, hours_penalty, preference_weight)
+        num_constraints = model.num_constraints
+    elif backend == 'cpsat':
+        model, x = build_cpsat_model(
+            df, hours_per_fortnight, ward_requirements, score_scale, hint, hour_targets, hours_penalty,
+            preference_weight)
+        num_constraints = len(model.Proto().constraints)
+    else:
+        raise ValueError(f"Unknown solver backend: {backend!r} (expected 'scip' or 'cpsat')")
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if backend == 'scip':
+        chosen, result = _solve_mip(model, x, time_limit_s)
+    else:
+        chosen, result = _solve_cpsat(model, x, time_limit_s, num_workers, score_scale)
+    solve_time = time.perf_counter() - start
+
+    # best_bound and gap are on the solver's own objective (CP-SAT: rounded integer scores,
+    # plus preference bonus and hour penalties), reported as model_objective next to them.
+    # objective is the exact GAT score sum of the chosen rows, comparable across backends.
+    gap = objective = None
+    if result['objective'] is not None:
+        gap = abs(result['best_bound'] - result['objective']) / max(abs(result['objective']), 1e-9)
+        objective = float(df.loc[chosen, 'gat_score'].sum())
+    stats = {
+        'backend': backend,
+        'status': result['status'],
+        'objective': objective,
+        'model_objective': result['objective'],
+        'best_bound': result['best_bound'],
+        'gap': gap,
+        'num_variables': len(x),
+        'num_constraints': num_constraints,
+        'build_time_s': build_time,
+        'solve_time_s': solve_time,
+    }
+    gap_text = f", gap {gap:.2%}" if gap is not None else ""
+    print(f"[solver] {backend}: {stats['num_variables']} variables, {num_constraints} constraints; "
+          f"build {build_time:.2f}s, solve {solve_time:.2f}s ({stats['status']}{gap_text})")
+
+    if chosen is None:
+        return None, stats
+    return df[chosen].copy(), stats
+
+def _flag_rows(df, keys_df, cols):
+    """Boolean mask of df rows whose cols values appear in keys_df (dates compared as timestamps)."""
+    def normalized(frame):
+        frame = frame[cols].copy()
+        if 'date' in cols:
+            frame['date'] = pd.to_datetime(frame['date'])
+        return frame
+    matched = normalized(df).merge(normalized(keys_df).drop_duplicates(), how='left', indicator=True)
+    return (matched['_merge'] == 'both').to_numpy()
+
+def resolve_assignment(
+    df,
+    previous_assignment,
+    changed_nurses=None,
+    changed_dates=None,
+    unavailable=None,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    stability_weight=1.0,
+    time_limit_s=10,
+    num_workers=8,
+    score_scale=1000
+):
+    """
+    Incremental re-solve after a roster change (sick call, changed ward requirement).
+
+    Only rows of changed_nurses, rows on changed_dates and rows on the dates in unavailable
+    are re-optimised; every other row keeps its value from previous_assignment and enters
+    the hour and coverage constraints as a constant. unavailable is a DataFrame of
+    (nurse_id, date) pairs that are forced off; those nurses' fortnight minimum-hours
+    constraints are relaxed. Re-optimised rows are hinted with the previous roster and
+    stability_weight rewards keeping them, so nurses are only moved when needed.
+
+    df is the same scored edge list passed to optimize_assignment and previous_assignment
+    its output (any frame with nurse_id and the shift key columns). Uses CP-SAT.
+    Returns (assignment_df, stats) like optimize_assignment.
+    """
+    df = add_fortnights(df.reset_index(drop=True).copy())
+    dates = pd.to_datetime(df['date'])
+    key_cols = ['nurse_id'] + SHIFT_KEY
+
+    previous = _flag_rows(df, previous_assignment, key_cols).astype(np.int64)
+    free = np.zeros(len(df), dtype=bool)
+    if changed_nurses is not None:
+        free |= df['nurse_id'].isin(changed_nurses).to_numpy()
+    if changed_dates is not None:
+        free |= dates.isin(pd.to_datetime(changed_dates)).to_numpy()
+    off = np.zeros(len(df), dtype=bool)
+    if unavailable is not None and len(unavailable):
+        off = _flag_rows(df, unavailable, ['nurse_id', 'date'])
+        free |= dates.isin(pd.to_datetime(unavailable['date'])).to_numpy()
+    free &= ~off
+
+    start = time.perf_counter()
+    # Fixed rows contribute constants to every hour and coverage group they belong to
+    fixed_value = np.where(free | off, 0, previous)
+    hours = df['duration_hours'].to_numpy(dtype=float)
+    hour_key = df.groupby(['nurse_id', 'fortnight'], sort=False, observed=True).ngroup().to_numpy()
+    slot_key = df.groupby(COVERAGE_KEY, sort=False, observed=True).ngroup().to_numpy()
+    fixed_hours = np.bincount(hour_key, weights=hours * fixed_value)
+    fixed_staff = np.bincount(slot_key, weights=fixed_value)
+    relaxed = np.zeros(hour_key.max() + 1, dtype=bool)
+    relaxed[hour_key[off]] = True
+
+    free_rows = np.flatnonzero(free)
+    sub = df.iloc[free_rows]
+    hours_scale = 1 if np.all(hours == np.round(hours)) else 60
+    objective = sub['gat_score'].to_numpy(dtype=float) + stability_weight * (2 * previous[free_rows] - 1)
+
+    model = cp_model.CpModel()
+    xs = np.array([model.NewBoolVar(f"x_{i}") for i in free_rows], dtype=object)
+    model.Maximize(cp_model.LinearExpr.WeightedSum(
+        list(xs), np.rint(objective * score_scale).astype(np.int64).tolist()))
+    sub_hours = np.rint(hours[free_rows] * hours_scale).astype(np.int64)
+    for rows in row_groups(sub, ['nurse_id', 'fortnight']):
+        group = hour_key[free_rows[rows[0]]]
+        if not relaxed[group]:
+            remaining = int(np.ceil((hours_per_fortnight - fixed_hours[group]) * hours_scale))
+            model.Add(cp_model.LinearExpr.WeightedSum(list(xs[rows]), sub_hours[rows].tolist()) >= remaining)
+    if ward_requirements is None:
+        ward_requirements = WARD_REQUIREMENTS
+    required = df['ward'].map(ward_requirements).to_numpy()
+    for rows in row_groups(sub, COVERAGE_KEY):
+        row = free_rows[rows[0]]
+        if not pd.isna(required[row]):
+            model.Add(cp_model.LinearExpr.Sum(list(xs[rows])) == int(required[row] - fixed_staff[slot_key[row]]))
+    for var, value in zip(xs, previous[free_rows]):
+        model.AddHint(var, int(value))
+    build_time = time.perf_counter() - start
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit_s
+    solver.parameters.num_workers = num_workers
+    start = time.perf_counter()
+    status = solver.Solve(model)
+    solve_time = time.perf_counter() - start
+
+    stats = {
+        'backend': 'cpsat',
+        'status': solver.StatusName(status),
+        'free_rows': len(free_rows),
+        'num_variables': len(xs),
+        'num_constraints': len(model.Proto().constraints),
+        'build_time_s': build_time,
+        'solve_time_s': solve_time,
+    }
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        print(f"[solver] re-solve over {len(free_rows)} free rows: {stats['status']}")
+        return None, stats
+
+    chosen = fixed_value.astype(bool)
+    chosen[free_rows] = [solver.BooleanValue(var) for var in xs]
+    stats['objective'] = float(df.loc[chosen, 'gat_score'].sum())
+    stats['changed_rows'] = int((chosen != previous.astype(bool)).sum())
+    print(f"[solver] re-solve over {len(free_rows)} free rows: build {build_time:.2f}s, "
+          f"solve {solve_time:.2f}s ({stats['status']}), {stats['changed_rows']} rows changed")
+    return df[chosen].copy(), stats
+
 def solve_assignment(
     edges_with_scores_path="data/edges_with_scores_readable.csv",
     output_assignment_path="data/assignment_ui_output.csv",
-    hours_per_fortnight=10
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    backend='scip',
+    time_limit_s=None,
+    num_workers=8
 ):
     """
     OR-Tools nurse scheduling solver with ward/shift/flex and hour constraints.
+    See optimize_assignment for the backend options. Input and output may be CSV, Parquet
+    or Feather (see src.utils.io).
     Returns path to UI-ready output.
     """
     # 1. Load the edge list (with nurse/shift/date/ward/etc.)
-    df = pd.read_csv(edges_with_scores_path)
+    df = read_table(edges_with_scores_path)
 
-    # 2. Extract basic sets
-    nurses = df['nurse_id'].unique().tolist()
-    shifts = df.index.tolist()  # each row is a nurse-shift application
+    # 2. Build and solve
+    df_out, _ = optimize_assignment(
+        df,
+        hours_per_fortnight,
+        ward_requirements,
+        backend=backend,
+        time_limit_s=time_limit_s,
+        num_workers=num_workers
+    )
 
-    # 3. OR-Tools setup
-    solver = pywraplp.Solver.CreateSolver('SCIP')
-    x = [solver.BoolVar(f"x_{i}") for i in shifts]  # x[i] means assign the shift in row i
-
-    # 4. Objective: maximize total GAT score
-    solver.Maximize(solver.Sum(x[i] * df.loc[i, 'gat_score'] for i in shifts))
-
-    # 5. Nurse hour constraints: each nurse must work at least 80 hours every 2 weeks
-    df['week'] = pd.to_datetime(df['date']).dt.isocalendar().week
-    # Build "fortnight" blocks (each 2-week period)
-    df['fortnight'] = (df['week'] - df['week'].min()) // 2
-    nurse_fortnights = df.groupby(['nurse_id', 'fortnight']).groups
-
-    for (nurse, fn), rows in nurse_fortnights.items():
-        solver.Add(
-            solver.Sum([x[i] * df.loc[i, 'duration_hours'] for i in rows]) >= hours_per_fortnight
-        )
-
-    # 6. Ward staffing constraints for every shift (point in time)
-    # For each shift time and ward, staff required:
-    ward_requirements = {'C': 4, 'B': 2, 'A': 1, 'ICU': 1}
-    # Group by date, start_time, end_time, ward
-    unique_shifts = df.groupby(['date', 'start_time', 'end_time', 'ward']).groups
-
-    for key, idxs in unique_shifts.items():
-        ward = key[3]
-        if ward in ward_requirements:
-            solver.Add(
-                solver.Sum([x[i] for i in idxs]) == ward_requirements[ward]
-            )
-
-    # 7. (Optional) Each nurse can't overlap shifts (simplest form, no two shifts at same start time)
-    # You can uncomment for more realistic constraint
-    # for nurse in nurses:
-    #     nurse_shifts = df[df['nurse_id'] == nurse]
-    #     times = nurse_shifts.groupby(['date', 'start_time']).groups
-    #     for key, idxs in times.items():
-    #         solver.Add(solver.Sum([x[i] for i in idxs]) <= 1)
-
-    # 8. Solve!
-    status = solver.Solve()
-
-    if status == pywraplp.Solver.OPTIMAL:
-        chosen = [i for i in shifts if x[i].solution_value() > 0.5]
-        df_out = df.iloc[chosen].copy()
-        df_out.to_csv(output_assignment_path, index=False)
+    if df_out is not None:
+        write_table(df_out, output_assignment_path)
         print(f"Assignment saved to {output_assignment_path}")
         print(df_out.head())
         return output_assignment_path
     else:
         print("No feasible solution found.")
         # Optionally save empty output
-        pd.DataFrame().to_csv(output_assignment_path, index=False)
+        write_table(pd.DataFrame(), output_assignment_path)
         return None
 
 # ---- Optional: CLI usage ----
 if __name__ == "__main__":
-    solve_assignment()
\ No newline at end of file
+    solve_assignment()
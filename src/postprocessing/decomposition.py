@@ -0,0 +1,170 @@
+# src/postprocessing/decomposition.py
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.postprocessing.assignmentsolver import add_fortnights, optimize_assignment
+
+SPLITS = ('ward', 'time', 'ward_time')
+BLOCK_HOURS_KEY = ['block', 'nurse_id', 'fortnight']
+
+def block_ids(df, split_by='ward', block_days=7):
+    """
+    Sub-problem id per row. Coverage slots never straddle a block: 'ward' splits by ward,
+    'time' by consecutive block_days-day windows and 'ward_time' by both.
+    """
+    if split_by not in SPLITS:
+        raise ValueError(f"Unknown split {split_by!r} (expected one of {SPLITS})")
+    cols = []
+    if split_by in ('ward', 'ward_time'):
+        cols.append(df['ward'].to_numpy())
+    if split_by in ('time', 'ward_time'):
+        days = pd.to_datetime(df['date'])
+        cols.append(((days - days.min()).dt.days // block_days).to_numpy())
+    if len(cols) == 1:
+        return pd.factorize(cols[0])[0]
+    return pd.MultiIndex.from_arrays(cols).factorize()[0]
+
+def allocate_hours(offered, worked, hours_per_fortnight):
+    """
+    Block-level minimum hours for the second pass. Each nurse keeps the hours the first pass
+    gave them in every block, and their remaining deficit against hours_per_fortnight is
+    spread over the blocks in proportion to the spare candidate hours each block still offers.
+    offered/worked are hours per (block, nurse_id, fortnight); returns a Series on offered's index.
+    """
+    worked = worked.reindex(offered.index, fill_value=0)
+    spare = offered - worked
+    pair = ['nurse_id', 'fortnight']
+    deficit = np.maximum(hours_per_fortnight - worked.groupby(level=pair, observed=True).transform('sum'), 0)
+    share = spare / spare.groupby(level=pair, observed=True).transform('sum').replace(0, np.nan)
+    return worked + (deficit * share).fillna(0)
+
+def hours_shortfall(df, assignment, hours_per_fortnight):
+    """Total hours below the fortnight minimum, summed over (nurse, fortnight) pairs with candidates."""
+    pairs = df.groupby(['nurse_id', 'fortnight'], observed=True).size().index
+    worked = assignment.groupby(['nurse_id', 'fortnight'], observed=True)['duration_hours'].sum().reindex(pairs, fill_value=0)
+    return float(np.maximum(hours_per_fortnight - worked, 0).sum())
+
+def _solve_block(block_df, targets, options, hours_penalty, hint):
+    # Top-level so the process pool can pickle it. Block minimums are tried as hard
+    # constraints first; a block that cannot meet its share falls back to soft minimums.
+    assignment, stats = optimize_assignment(block_df, hour_targets=targets, hint=hint, **options)
+    if assignment is None and targets is not None and hours_penalty is not None:
+        assignment, stats = optimize_assignment(
+            block_df, hour_targets=targets, hours_penalty=hours_penalty, hint=hint, **options)
+    return assignment, stats
+
+def _solve_blocks(pool, df, block_list, options, hours_penalty, targets=None, previous=None):
+    """
+    Submit one _solve_block per block id and wait for all of them; returns {block: (df, stats)}.
+    Rows chosen in previous (an earlier merged roster) are passed on as the CP-SAT hint.
+    """
+    futures = {}
+    for b in block_list:
+        block_df = df[df['block'] == b]
+        block_targets = hint = None
+        if targets is not None:
+            block_targets = targets.xs(b, level='block')
+        if previous is not None:
+            hint = block_df['row'].isin(previous['row']).to_numpy()
+        futures[b] = pool.submit(_solve_block, block_df, block_targets, options, hours_penalty, hint)
+    return {b: future.result() for b, future in futures.items()}
+
+def solve_decomposed(
+    df,
+    split_by='ward',
+    block_days=7,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    backend='scip',
+    time_limit_s=30,
+    num_workers=1,
+    max_workers=None,
+    hours_penalty=1.0,
+    preference_weight=0.0
+):
+    """
+    Solve the assignment as independent sub-problems, one per ward and/or time block, in a
+    process pool. Coverage constraints are local to a block; the only coupling is the
+    per-(nurse, fortnight) hour minimum, handled in two passes:
+      1. every block is solved for score and coverage alone
+      2. nurses still short of hours_per_fortnight get their deficit allocated over the
+         blocks with spare candidate hours (allocate_hours), and only the blocks whose
+         minimums went up are re-solved, warm-started from the first pass. A block that
+         cannot meet its share is re-solved with soft minimums costing hours_penalty per
+         missing hour (None disables this). The second pass is kept only if it reduces
+         the total hours shortfall.
+
+    Solve time grows with the largest block rather than with the whole roster; time_limit_s
+    applies per block solve. The merged roster can still fall short of the monolithic hour
+    constraint; stats['hours_shortfall'] says by how much. num_workers is the CP-SAT search
+    threads per block; max_workers the number of block processes (defaults to the CPU count).
+    Returns (assignment_df, stats); assignment_df is None if any block found no solution.
+    """
+    start = time.perf_counter()
+    df = add_fortnights(df.reset_index(drop=True).copy())
+    df['block'] = block_ids(df, split_by, block_days)
+    df['row'] = np.arange(len(df))
+    num_blocks = int(df['block'].max()) + 1 if len(df) else 0
+    options = {
+        'hours_per_fortnight': 0,
+        'ward_requirements': ward_requirements,
+        'backend': backend,
+        'time_limit_s': time_limit_s,
+        'num_workers': num_workers,
+        'preference_weight': preference_weight,
+    }
+
+    max_workers = min(max_workers or os.cpu_count() or 1, max(num_blocks, 1))
+    resolved = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = _solve_blocks(pool, df, range(num_blocks), options, hours_penalty)
+        parts = [results[b][0] for b in range(num_blocks)]
+        if hours_per_fortnight and all(part is not None for part in parts):
+            first_pass = pd.concat(parts, ignore_index=True)
+            worked = first_pass.groupby(BLOCK_HOURS_KEY, observed=True)['duration_hours'].sum()
+            offered = df.groupby(BLOCK_HOURS_KEY, observed=True)['duration_hours'].sum()
+            targets = allocate_hours(offered, worked, hours_per_fortnight)
+            raised = targets > worked.reindex(targets.index, fill_value=0)
+            resolved = sorted(targets[raised].index.get_level_values('block').unique())
+            second = _solve_blocks(pool, df, resolved, options, hours_penalty, targets, first_pass)
+            candidate = {**results, **second}
+            candidate_parts = [candidate[b][0] for b in range(num_blocks)]
+            if all(part is not None for part in candidate_parts) and (
+                hours_shortfall(df, pd.concat(candidate_parts), hours_per_fortnight)
+                < hours_shortfall(df, first_pass, hours_per_fortnight)
+            ):
+                results, parts = candidate, candidate_parts
+            else:
+                resolved = []
+
+    block_stats = [results[b][1] for b in range(num_blocks)]
+    wall_time = time.perf_counter() - start
+    stats = {
+        'backend': backend,
+        'split_by': split_by,
+        'num_blocks': num_blocks,
+        'num_resolved': len(resolved),
+        'max_workers': max_workers,
+        'status': 'FAILED' if any(part is None for part in parts) else 'OK',
+        'objective': None,
+        'hours_shortfall': None,
+        'wall_time_s': wall_time,
+        'max_block_solve_s': max((s['solve_time_s'] for s in block_stats), default=0.0),
+        'blocks': block_stats,
+    }
+    if stats['status'] == 'FAILED':
+        print(f"[solver] decomposed ({split_by}): {num_blocks} blocks, at least one without a solution")
+        return None, stats
+
+    assignment = pd.concat(parts, ignore_index=True).drop(columns=['block', 'row'])
+    stats['objective'] = float(assignment['gat_score'].sum())
+    stats['hours_shortfall'] = hours_shortfall(df, assignment, hours_per_fortnight)
+    print(f"[solver] decomposed ({split_by}): {num_blocks} blocks ({len(resolved)} re-solved) on "
+          f"{max_workers} processes; wall {wall_time:.2f}s, slowest block {stats['max_block_solve_s']:.2f}s, "
+          f"objective {stats['objective']:.3f}, hours shortfall {stats['hours_shortfall']:.1f}")
+    return assignment, stats
@@ -1,15 +1,25 @@
-# src/preprocessing/metrics.py
+# src/postprocessing/metrics.py
 
+import copy
+
+import numpy as np
 import pandas as pd
 
-def evaluate_preference_match(
-    assignment_path="data/assignment_ui_output.csv",
-    preference_path="data/preference.csv",
-    output_path="data/preference_evaluation.csv"
-):
-    # Read your CSVs
-    pred = pd.read_csv(assignment_path)
-    pref = pd.read_csv(preference_path)
+from src.preprocessing.pruning import shift_intervals
+from src.postprocessing.assignmentsolver import COVERAGE_KEY, WARD_REQUIREMENTS, plan_anchor
+from src.utils.io import read_table, write_table
+
+# Columns that identify one nurse-shift row in both candidates and assignments
+ROSTER_KEY = ['nurse_id', 'date', 'ward', 'shift', 'start_time', 'end_time']
+
+def preference_match(pred, pref):
+    """
+    In-memory version of evaluate_preference_match: assignment rows of pred left-joined
+    with the preferences in pref (raw preference.csv columns or load_preferences output).
+    Returns (merged, match_rate, nurse_pref_score).
+    """
+    pred = pred.assign(date=pd.to_datetime(pred['date']))
+    pref = pref.assign(date=pd.to_datetime(pref['date']))
 
     # Standardize column names
     if 'preferred_shift' in pref.columns:
@@ -35,11 +45,198 @@ def evaluate_preference_match(
     print(f"Preference match rate: {match_rate:.2%}")
 
     # Per-nurse match rate
-    nurse_pref_score = merged.groupby('nurse_id')['preference_match'].mean()
+    nurse_pref_score = merged.groupby('nurse_id', observed=True)['preference_match'].mean()
     print("\nPer nurse preference match rate:\n", nurse_pref_score)
+    return merged, match_rate, nurse_pref_score
+
+def gini(values):
+    """Gini coefficient of non-negative values along the last axis (0 = perfectly even load)."""
+    values = np.sort(np.asarray(values, dtype=float), axis=-1)
+    n = values.shape[-1]
+    total = values.sum(axis=-1)
+    weighted = (values * np.arange(1, n + 1)).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, 2 * weighted / (n * total) - (n + 1) / n, 0.0)
+
+class RosterMetrics:
+    """
+    Fairness, coverage and preference metrics for rosters drawn from one candidate edge list.
+
+    Everything that does not depend on the roster is encoded once: nurse, (nurse, fortnight)
+    and (date, start_time, end_time, ward) slot codes, slot requirements and weekend / night
+    / preferred flags per candidate row. A roster is then a 0/1 vector over the candidate
+    rows, and evaluate() is a handful of bincounts, so it is cheap enough to score many
+    rosters inside a solver loop. chosen may also be a (k, rows) matrix of k rosters; every
+    summary value is then an array of length k.
+
+    Night shifts are the ones running past midnight (see shift_intervals); weekend shifts
+    start on a Saturday or Sunday.
+    """
+    def __init__(self, candidates, hours_per_fortnight=10, ward_requirements=None, anchor=None):
+        df = candidates.reset_index(drop=True)
+        if ward_requirements is None:
+            ward_requirements = WARD_REQUIREMENTS
+        self.candidates = df
+        self.hours_per_fortnight = hours_per_fortnight
+        self.hours = df['duration_hours'].to_numpy(dtype=float)
+
+        dates = pd.to_datetime(df['date'])
+        fortnight = (dates - pd.Timestamp(anchor if anchor is not None else plan_anchor(dates))).dt.days // 14
+        self.nurse_code, self.nurses = pd.factorize(df['nurse_id'], sort=True)
+        pairs = pd.DataFrame({'nurse': self.nurse_code, 'fortnight': fortnight.to_numpy()})
+        self.pair_code = pairs.groupby(['nurse', 'fortnight']).ngroup().to_numpy()
+        self.pair_nurse = np.zeros(self.pair_code.max() + 1 if len(df) else 0, dtype=np.int64)
+        self.pair_nurse[self.pair_code] = self.nurse_code
+
+        slots = df.groupby(COVERAGE_KEY, observed=True)
+        self.slot_code = slots.ngroup().to_numpy()
+        self.slot_keys = slots.size().index.to_frame(index=False)
+        self.required = self.slot_keys['ward'].astype(object).map(ward_requirements).to_numpy(dtype=float)
+
+        start, end = shift_intervals(df)
+        self.weekend = (dates.dt.dayofweek >= 5).to_numpy(dtype=float)
+        self.night = (end.astype('datetime64[D]') > start.astype('datetime64[D]')).astype(float)
+        self.preferred = (df['is_preferred'].to_numpy(dtype=float) if 'is_preferred' in df.columns
+                          else np.zeros(len(df)))
+        self._row_index = None
+
+    def with_targets(self, hours_per_fortnight=None, ward_requirements=None):
+        """Shallow copy sharing the row encodings, with another hour minimum and/or slot requirements."""
+        other = copy.copy(self)
+        if hours_per_fortnight is not None:
+            other.hours_per_fortnight = hours_per_fortnight
+        if ward_requirements is not None:
+            other.required = self.slot_keys['ward'].astype(object).map(ward_requirements).to_numpy(dtype=float)
+        return other
+
+    def chosen_mask(self, assignment):
+        """0/1 vector over the candidate rows marking the rows of an assignment DataFrame."""
+        if self._row_index is None:
+            self._row_index = pd.MultiIndex.from_frame(self._key_frame(self.candidates))
+        positions = self._row_index.get_indexer(pd.MultiIndex.from_frame(self._key_frame(assignment)))
+        if (positions < 0).any():
+            raise ValueError(f"{(positions < 0).sum()} assignment rows are not among the candidates")
+        chosen = np.zeros(len(self.candidates))
+        chosen[positions] = 1
+        return chosen
+
+    @staticmethod
+    def _key_frame(df):
+        keys = df[ROSTER_KEY].astype(str)
+        keys['date'] = pd.to_datetime(df['date']).to_numpy()
+        return keys
+
+    @staticmethod
+    def _group_sums(codes, n_groups, weights):
+        # One bincount for all k rosters: roster j's groups are offset by j * n_groups
+        k = weights.shape[0]
+        flat = (codes + n_groups * np.arange(k)[:, None]).ravel()
+        return np.bincount(flat, weights=weights.ravel(), minlength=k * n_groups).reshape(k, n_groups)
+
+    def _counts(self, chosen):
+        chosen = np.atleast_2d(np.asarray(chosen, dtype=float))
+        n_nurses, n_pairs, n_slots = len(self.nurses), len(self.pair_nurse), len(self.slot_keys)
+        worked = self._group_sums(self.pair_code, n_pairs, chosen * self.hours)
+        deficit = np.maximum(self.hours_per_fortnight - worked, 0)
+        staffed = self._group_sums(self.slot_code, n_slots, chosen)
+        has_requirement = ~np.isnan(self.required)
+        required = np.where(has_requirement, self.required, 0)
+        return {
+            'shifts': self._group_sums(self.nurse_code, n_nurses, chosen),
+            'hours': self._group_sums(self.nurse_code, n_nurses, chosen * self.hours),
+            'hours_shortfall': self._group_sums(self.pair_nurse, n_nurses, deficit),
+            'fortnights': np.bincount(self.pair_nurse, minlength=n_nurses),
+            'weekend_shifts': self._group_sums(self.nurse_code, n_nurses, chosen * self.weekend),
+            'night_shifts': self._group_sums(self.nurse_code, n_nurses, chosen * self.night),
+            'preferred_shifts': self._group_sums(self.nurse_code, n_nurses, chosen * self.preferred),
+            'staffed': staffed,
+            'coverage_shortfall': np.where(has_requirement, np.maximum(required - staffed, 0), 0),
+            'coverage_excess': np.where(has_requirement, np.maximum(staffed - required, 0), 0),
+        }
+
+    def evaluate(self, chosen):
+        """
+        Summary metrics for one roster (0/1 vector over the candidate rows) or k rosters
+        (k x rows matrix): hours shortfall against the fortnight minimum, hours / weekend /
+        night load spread across nurses (Gini and standard deviation), coverage shortfall
+        and excess over the slot requirements, and preference hits.
+        """
+        single = np.ndim(chosen) == 1
+        c = self._counts(chosen)
+        shifts = c['shifts'].sum(axis=1)
+        preferred = c['preferred_shifts'].sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            summary = {
+                'assigned_shifts': shifts,
+                'total_hours': c['hours'].sum(axis=1),
+                'hours_shortfall': c['hours_shortfall'].sum(axis=1),
+                'nurses_below_target': (c['hours_shortfall'] > 0).sum(axis=1),
+                'hours_gini': gini(c['hours']),
+                'hours_std': c['hours'].std(axis=1),
+                'weekend_gini': gini(c['weekend_shifts']),
+                'weekend_std': c['weekend_shifts'].std(axis=1),
+                'night_gini': gini(c['night_shifts']),
+                'night_std': c['night_shifts'].std(axis=1),
+                'coverage_shortfall': c['coverage_shortfall'].sum(axis=1),
+                'slots_understaffed': (c['coverage_shortfall'] > 0).sum(axis=1),
+                'coverage_excess': c['coverage_excess'].sum(axis=1),
+                # Share of assigned shifts that were requested, and of requests that were granted
+                'preference_hit_rate': np.where(shifts > 0, preferred / shifts, 0.0),
+                'preferences_granted': preferred / self.preferred.sum() if self.preferred.any() else np.zeros(len(shifts)),
+            }
+        if single:
+            return {name: float(values[0]) for name, values in summary.items()}
+        return summary
+
+    def nurse_table(self, chosen):
+        """Per-nurse shifts, hours against the fortnight target, weekend/night load and preference hits."""
+        c = self._counts(chosen)
+        table = pd.DataFrame({
+            name: c[name][0] for name in
+            ['shifts', 'hours', 'hours_shortfall', 'weekend_shifts', 'night_shifts', 'preferred_shifts']
+        })
+        table.insert(0, 'nurse_id', self.nurses)
+        table.insert(3, 'target_hours', c['fortnights'] * self.hours_per_fortnight)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['preference_hit_rate'] = np.where(table['shifts'] > 0, table['preferred_shifts'] / table['shifts'], 0.0)
+        return table
+
+    def coverage_table(self, chosen):
+        """Required and staffed nurses per (date, start_time, end_time, ward) slot."""
+        c = self._counts(chosen)
+        table = self.slot_keys.copy()
+        table['required'] = self.required
+        table['staffed'] = c['staffed'][0]
+        table['shortfall'] = c['coverage_shortfall'][0]
+        return table
+
+def roster_metrics(candidates, assignment, hours_per_fortnight=10, ward_requirements=None):
+    """
+    One-off RosterMetrics evaluation of an assignment drawn from candidates.
+    Returns (summary, nurse_df, coverage_df).
+    """
+    metrics = RosterMetrics(candidates, hours_per_fortnight, ward_requirements)
+    chosen = metrics.chosen_mask(assignment)
+    summary = metrics.evaluate(chosen)
+    print(f"[metrics] hours shortfall {summary['hours_shortfall']:.1f} "
+          f"({summary['nurses_below_target']:.0f} nurses below target), hours Gini {summary['hours_gini']:.3f}, "
+          f"weekend Gini {summary['weekend_gini']:.3f}, night Gini {summary['night_gini']:.3f}, "
+          f"coverage shortfall {summary['coverage_shortfall']:.0f} in {summary['slots_understaffed']:.0f} slots, "
+          f"preference hit rate {summary['preference_hit_rate']:.2%}")
+    return summary, metrics.nurse_table(chosen), metrics.coverage_table(chosen)
+
+def evaluate_preference_match(
+    assignment_path="data/assignment_ui_output.csv",
+    preference_path="data/preference.csv",
+    output_path="data/preference_evaluation.csv"
+):
+    # Read the assignment (CSV, Parquet or Feather) and preferences
+    pred = read_table(assignment_path)
+    pref = pd.read_csv(preference_path)
+    merged, match_rate, nurse_pref_score = preference_match(pred, pref)
 
     # Save for review
-    merged.to_csv(output_path, index=False)
+    write_table(merged, output_path)
     print(f"\nDetailed match evaluation exported to: {output_path}")
 
     # Also return for programmatic use if needed
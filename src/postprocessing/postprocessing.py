@@ -1,7 +1,30 @@
 #src/postprocessing/postprocessing.py
 
 import pandas as pd
-import os
+
+from src.preprocessing.candidates import SHIFT_KEY
+from src.utils.io import read_table, write_table
+
+COLUMNS_OUT = [
+    'nurse_node', 'nurse_id',
+    'shift_node', 'date', 'shift', 'ward', 'start_time', 'end_time',
+    'duration_hours', 'gat_score'
+]
+
+def attach_edge_mappings(df_edges, nurse_map, shift_map):
+    """
+    In-memory version of prepare_edges_for_assignment: joins scored edges
+    (nurse_node, shift_node, gat_score) with the index maps returned by build_graph.
+    """
+    # Maps are keyed by unique node index, so each lookup is a reindex rather than a merge
+    nurse_map = nurse_map.set_index('nurse_idx')
+    shift_map = shift_map.set_index('shift_idx')
+    df = df_edges.reset_index(drop=True)
+    for col in nurse_map.columns:
+        df[col] = nurse_map[col].reindex(df['nurse_node']).to_numpy()
+    for col in shift_map.columns:
+        df[col] = shift_map[col].reindex(df['shift_node']).to_numpy()
+    return df[[col for col in COLUMNS_OUT if col in df.columns]]
 
 def prepare_edges_for_assignment(
     edges_path="data/edges_with_scores.csv",
@@ -12,46 +35,33 @@ def prepare_edges_for_assignment(
     """
     Combines model output (edges_with_scores.csv) with nurse and shift mappings
     to produce a human-readable edge list for the assignment solver/UI.
+    Any path may be CSV, Parquet or Feather (see src.utils.io).
     """
     # 1. Load files
-    df_edges = pd.read_csv(edges_path)
-    df_nurse = pd.read_csv(nurse_map_path)
-    df_shift = pd.read_csv(shift_map_path)
+    df_edges = read_table(edges_path)
+    df_nurse = read_table(nurse_map_path)
+    df_shift = read_table(shift_map_path)
 
     # 2. Merge nurse and shift mapping
-    df = df_edges.merge(df_nurse, left_on='nurse_node', right_on='nurse_idx', how='left')
-    df = df.merge(df_shift, left_on='shift_node', right_on='shift_idx', how='left')
+    df = attach_edge_mappings(df_edges, df_nurse, df_shift)
 
     # 3. Ensure duration_hours is included!
     if 'duration_hours' not in df.columns:
         print("WARNING: 'duration_hours' missing after merge. Trying to patch from original data...")
         df_orig = pd.read_csv("data/combined.csv")
-        df_orig['shift_id'] = (
-            df_orig['date'].astype(str) + "_" +
-            df_orig['shift'].astype(str) + "_" +
-            df_orig['ward'].astype(str) + "_" +
-            df_orig['start_time'].astype(str) + "_" +
-            df_orig['end_time'].astype(str)
-        )
         df = df.merge(
-            df_orig[['shift_id', 'duration_hours']].drop_duplicates(),
-            on='shift_id',
+            df_orig[SHIFT_KEY + ['duration_hours']].drop_duplicates(SHIFT_KEY),
+            on=SHIFT_KEY,
             how='left'
         )
 
     print("Final columns in merged DataFrame:", df.columns.tolist())
 
     # 4. Output columns for assignment solver and UI
-    columns_out = [
-        'nurse_node', 'nurse_id',
-        'shift_node', 'date', 'shift', 'ward', 'start_time', 'end_time',
-        'duration_hours', 'gat_score'
-    ]
-    columns_out = [col for col in columns_out if col in df.columns]
-    df = df[columns_out]
+    df = df[[col for col in COLUMNS_OUT if col in df.columns]]
 
     # 5. Save
-    df.to_csv(output_path, index=False)
+    write_table(df, output_path)
     print(f"[postprocessing] Human-readable edge list saved to {output_path}")
     return output_path
 
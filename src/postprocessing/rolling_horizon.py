@@ -0,0 +1,142 @@
+# src/postprocessing/rolling_horizon.py
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.pruning import prune_candidates
+from src.postprocessing.assignmentsolver import add_fortnights, optimize_assignment, plan_anchor
+from src.postprocessing.decomposition import hours_shortfall
+
+def prorated_targets(window_df, committed, anchor, plan_start, plan_end, window_end, hours_per_fortnight):
+    """
+    Minimum hours per (nurse_id, fortnight) for one window, as a Series for hour_targets.
+
+    A fortnight that runs past window_end only owes the share of hours_per_fortnight for the
+    plan days seen so far; a fortnight that ends inside the window owes all of it. Hours
+    already committed by earlier windows are subtracted.
+    """
+    pairs = window_df.groupby(['nurse_id', 'fortnight'], observed=True).size().index
+    fortnights = pairs.get_level_values('fortnight').to_numpy()
+    starts = pd.Timestamp(anchor) + pd.to_timedelta(fortnights * 14, unit='D')
+    ends = starts + pd.Timedelta(days=14)
+    day = pd.Timedelta(days=1)
+
+    def overlap_days(lo, hi):
+        return np.maximum((np.minimum(ends, hi) - np.maximum(starts, lo)) / day, 0)
+
+    in_plan = overlap_days(plan_start, plan_end + day)
+    seen = overlap_days(plan_start, window_end)
+    due = hours_per_fortnight * seen / np.maximum(in_plan, 1)
+
+    done = committed.groupby(['nurse_id', 'fortnight'], observed=True)['duration_hours'].sum().reindex(pairs, fill_value=0)
+    return pd.Series(np.maximum(due - done.to_numpy(), 0), index=pairs)
+
+def solve_rolling(
+    df,
+    window_days=28,
+    commit_days=14,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    min_rest_hours=None,
+    backend='scip',
+    time_limit_s=None,
+    num_workers=8,
+    hours_penalty=None,
+    preference_weight=0.0
+):
+    """
+    Rolling-horizon solve for long planning windows. Overlapping windows of window_days are
+    solved one after another and only their first commit_days are kept; the rest is re-planned
+    by the next window, which is warm-started (CP-SAT hint) from the overlap.
+
+    State carried forward between windows:
+      - hours: committed hours count towards each nurse's fortnight minimum (prorated_targets),
+        with fortnight ids anchored at the plan start so they stay stable across windows
+      - rest: with min_rest_hours, candidate rows too close to a committed shift are pruned
+
+    Memory and solve time are bounded by the window, not the plan. hours_penalty makes the
+    per-window minimums soft (see optimize_assignment) so a short window cannot stall the plan.
+    Returns (assignment_df, stats); assignment_df is None if some window has no solution.
+    """
+    if window_days <= 0:
+        raise ValueError(f"window_days must be positive, got {window_days}")
+    if not 0 < commit_days <= window_days:
+        raise ValueError(f"commit_days ({commit_days}) must be positive and not exceed window_days ({window_days})")
+
+    start_time = time.perf_counter()
+    dates = pd.to_datetime(df['date'])
+    anchor = plan_anchor(dates)
+    df = add_fortnights(df.reset_index(drop=True).copy(), anchor)
+    df['row'] = np.arange(len(df))
+    plan_start, plan_end = dates.min().normalize(), dates.max().normalize()
+
+    committed = df.iloc[:0]
+    previous = None
+    window_stats = []
+    window_start = plan_start
+    while window_start <= plan_end:
+        window_end = window_start + pd.Timedelta(days=window_days)
+        commit_end = window_start + pd.Timedelta(days=commit_days)
+        window_df = df[((dates >= window_start) & (dates < window_end)).to_numpy()]
+        if window_df.empty:
+            window_start = commit_end
+            continue
+        if min_rest_hours and len(committed):
+            window_df, _ = prune_candidates(
+                window_df,
+                committed,
+                committed_df=committed,
+                ward_qualification=False,
+                min_rest_hours=min_rest_hours
+            )
+
+        targets = prorated_targets(
+            window_df, committed, anchor, plan_start, plan_end, window_end, hours_per_fortnight)
+        hint = None
+        if previous is not None:
+            hint = window_df['row'].isin(previous['row']).to_numpy()
+        assignment, stats = optimize_assignment(
+            window_df,
+            hours_per_fortnight,
+            ward_requirements,
+            backend=backend,
+            time_limit_s=time_limit_s,
+            num_workers=num_workers,
+            hint=hint,
+            hour_targets=targets,
+            hours_penalty=hours_penalty,
+            preference_weight=preference_weight
+        )
+        stats['window_start'] = str(window_start.date())
+        stats['window_rows'] = len(window_df)
+        window_stats.append(stats)
+        if assignment is None:
+            print(f"[rolling] window starting {window_start.date()} has no solution; stopping")
+            return None, {'windows': window_stats, 'status': 'FAILED'}
+
+        # The last window reaches the plan end, so all of it is committed
+        if window_end > plan_end:
+            committed = pd.concat([committed, assignment], ignore_index=True)
+            break
+        keep = pd.to_datetime(assignment['date']) < commit_end
+        committed = pd.concat([committed, assignment[keep.to_numpy()]], ignore_index=True)
+        previous = assignment
+        window_start = commit_end
+
+    wall_time = time.perf_counter() - start_time
+    committed = committed.drop(columns='row')
+    stats = {
+        'status': 'OK',
+        'num_windows': len(window_stats),
+        'max_window_rows': max(s['window_rows'] for s in window_stats),
+        'objective': float(committed['gat_score'].sum()),
+        'hours_shortfall': hours_shortfall(df, committed, hours_per_fortnight),
+        'wall_time_s': wall_time,
+        'windows': window_stats,
+    }
+    print(f"[rolling] {stats['num_windows']} windows of {window_days} days (commit {commit_days}); "
+          f"wall {wall_time:.2f}s, largest window {stats['max_window_rows']} rows, "
+          f"objective {stats['objective']:.3f}, hours shortfall {stats['hours_shortfall']:.1f}")
+    return committed, stats
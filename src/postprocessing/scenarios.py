@@ -0,0 +1,137 @@
+# src/postprocessing/scenarios.py
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.postprocessing.assignmentsolver import add_fortnights, optimize_assignment
+from src.postprocessing.metrics import RosterMetrics
+from src.runner import PipelineRunner
+from src.utils.io import write_table
+
+# Per-scenario settings; anything left out comes from solve_scenarios' defaults
+SCENARIO_KEYS = ('hours_per_fortnight', 'ward_requirements', 'preference_weight', 'hours_penalty')
+
+# Scored edges and their metric encodings, set once per worker process by _init_worker
+_edges = None
+_metrics = None
+
+def _init_worker(edges, metrics):
+    global _edges, _metrics
+    _edges, _metrics = edges, metrics
+
+def _solve_scenario(name, settings, options):
+    # Top-level so the process pool can pickle it; only the scenario settings travel per task
+    assignment, stats = optimize_assignment(_edges, **settings, **options)
+    row = {'scenario': name, **settings, 'status': stats['status'],
+           'objective': stats.get('objective'), 'solve_time_s': stats['solve_time_s']}
+    if assignment is not None:
+        metrics = _metrics.with_targets(settings['hours_per_fortnight'], settings['ward_requirements'])
+        row.update(metrics.evaluate(metrics.chosen_mask(assignment)))
+    return row, assignment
+
+def solve_scenarios(
+    edges,
+    scenarios,
+    hours_per_fortnight=10,
+    ward_requirements=None,
+    preference_weight=0.0,
+    hours_penalty=None,
+    backend='scip',
+    time_limit_s=30,
+    num_workers=1,
+    max_workers=None
+):
+    """
+    What-if comparison of staffing scenarios on one set of scored edges.
+
+    scenarios is a list of dicts with a 'name' and any of SCENARIO_KEYS, e.g.
+      {'name': 'icu_2', 'ward_requirements': {'C': 4, 'B': 2, 'A': 1, 'ICU': 2}}
+    Each scenario is a full optimize_assignment solve, run concurrently in max_workers
+    processes (defaults to the CPU count). The edges are prepared (fortnights) and encoded
+    for RosterMetrics once, and handed to each worker process once when it starts, so a
+    task only carries its scenario settings. num_workers is the CP-SAT thread count per solve.
+
+    Returns (table, assignments): one table row per scenario with its settings, solver
+    status, objective and solve time, plus the RosterMetrics summary (coverage, fairness,
+    preference hits) when a solution was found; assignments maps name -> roster (or None).
+    """
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names must be unique, got {names}")
+    unknown = {key for scenario in scenarios for key in scenario} - set(SCENARIO_KEYS) - {'name'}
+    if unknown:
+        raise ValueError(f"Unknown scenario settings {sorted(unknown)} (expected {SCENARIO_KEYS})")
+
+    start_time = time.perf_counter()
+    edges = add_fortnights(edges.reset_index(drop=True).copy())
+    metrics = RosterMetrics(edges, hours_per_fortnight, ward_requirements)
+    defaults = {
+        'hours_per_fortnight': hours_per_fortnight,
+        'ward_requirements': ward_requirements,
+        'preference_weight': preference_weight,
+        'hours_penalty': hours_penalty,
+    }
+    options = {'backend': backend, 'time_limit_s': time_limit_s, 'num_workers': num_workers}
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(scenarios), 1))
+
+    rows, assignments = [], {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(edges, metrics)) as pool:
+        futures = {
+            scenario['name']: pool.submit(
+                _solve_scenario,
+                scenario['name'],
+                {**defaults, **{key: scenario[key] for key in SCENARIO_KEYS if key in scenario}},
+                options
+            )
+            for scenario in scenarios
+        }
+        for name, future in futures.items():
+            row, assignments[name] = future.result()
+            rows.append(row)
+
+    table = pd.DataFrame(rows)
+    # Requirement dicts as text so the table can be written to CSV/Parquet
+    table['ward_requirements'] = table['ward_requirements'].map(lambda req: None if req is None else str(req))
+    print(f"[scenarios] {len(scenarios)} scenarios in {max_workers} processes; "
+          f"wall {time.perf_counter() - start_time:.2f}s, "
+          f"{int(np.sum(table['status'].isin(['OPTIMAL', 'FEASIBLE'])))} with a solution")
+    return table, assignments
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the scenarios in a YAML file on the pipeline's scored edges.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--scenarios", required=True,
+                        help="YAML list of scenarios: name plus any of " + ", ".join(SCENARIO_KEYS))
+    parser.add_argument("--output", default=None, help="comparison table path (default data/scenarios.csv)")
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    with open(args.scenarios, "r") as f:
+        scenarios = yaml.safe_load(f)
+    edges = PipelineRunner(cfg).run('postprocess')['edges']
+    table, _ = solve_scenarios(
+        edges,
+        scenarios,
+        hours_per_fortnight=cfg['hours_per_fortnight'],
+        ward_requirements=cfg.get('ward_requirements'),
+        preference_weight=cfg.get('preference_weight', 0.0),
+        backend=cfg['solver']['backend'],
+        time_limit_s=cfg['solver']['time_limit_s'],
+        max_workers=args.max_workers or cfg['solver'].get('max_workers')
+    )
+    output = args.output or os.path.join(cfg['paths']['data_dir'], "scenarios.csv")
+    write_table(table, output)
+    print(table.to_string(index=False))
+    print(f"[scenarios] comparison table written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# src/preprocessing/candidates.py
+
+import numpy as np
+import pandas as pd
+
+SHIFT_KEY = ['date', 'shift', 'ward', 'start_time', 'end_time']
+SHIFT_COLS = SHIFT_KEY + ['duration_hours']
+PREFERENCE_KEY = ['date', 'shift', 'ward']
+
+def load_preferences(preference_path="data/preference.csv"):
+    """Read preference.csv with parsed dates and the shift/ward names used downstream."""
+    pref_df = pd.read_csv(preference_path)
+    pref_df['date'] = pd.to_datetime(pref_df['date'])
+    # Standardize column names for easier downstream processing
+    return pref_df.rename(columns={
+        'preferred_shift': 'shift',
+        'preferred_ward': 'ward'
+    })
+
+def generate_candidates(nurse_list, pref_df):
+    """
+    Cartesian product of nurses and the distinct shifts in pref_df, nurse-major, with
+    is_preferred set when the nurse requested that (date, shift, ward) and label=0.
+    """
+    shifts_for_window = pref_df[SHIFT_COLS].drop_duplicates().reset_index(drop=True)
+    nurse_list = np.asarray(nurse_list, dtype=object)
+    n_nurses, n_shifts = len(nurse_list), len(shifts_for_window)
+
+    nurse_pos = np.repeat(np.arange(n_nurses), n_shifts)
+    shift_pos = np.tile(np.arange(n_shifts), n_nurses)
+    candidate_df = shifts_for_window.iloc[shift_pos].reset_index(drop=True)
+    candidate_df.insert(0, 'shift_idx', shift_pos)
+    candidate_df.insert(0, 'nurse_id', nurse_list[nurse_pos])
+
+    # Resolve each preference to (nurse position, shift position) on the small tables, then
+    # flag the matching rows of the flat nurse-major product in one scatter.
+    requested = pref_df[['nurse_id'] + PREFERENCE_KEY].merge(
+        shifts_for_window[PREFERENCE_KEY].reset_index(names='shift_pos'), on=PREFERENCE_KEY
+    )
+    requested['nurse_pos'] = pd.Index(nurse_list).get_indexer(requested['nurse_id'])
+    requested = requested[requested['nurse_pos'] >= 0]
+    is_preferred = np.zeros(n_nurses * n_shifts, dtype=bool)
+    is_preferred[requested['nurse_pos'].to_numpy() * n_shifts + requested['shift_pos'].to_numpy()] = True
+
+    candidate_df['is_preferred'] = is_preferred
+    candidate_df['label'] = 0  # All are unassigned (candidate edges)
+    return candidate_df
@@ -3,6 +3,8 @@
 import pandas as pd
 import numpy as np
 
+HISTORY_FEATURES = ['hours_last_2wks', 'days_since_last_shift', 'consecutive_work_days']
+
 def add_total_hours_in_fortnight(df, assigned_df):
     """Add feature: Total hours worked in last 2 weeks."""
     def get_total_hours(nurse_id, shift_date):
@@ -58,6 +60,124 @@ def add_consecutive_work_days(df, assigned_df):
     )
     return df
 
+def _history_lookup(query_nurse, query_date, hist_nurse, hist_date, hist_hours, window_days=13):
+    """
+    Resolve every query (nurse, date) against the assignment history in one pass.
+    History is sorted once by (nurse, date); queries are answered with searchsorted
+    on a combined integer key and cumulative sums, so cost is O((rows + history) log history).
+
+    Returns (hours in [date - window_days, date), date of the latest earlier shift or NaT,
+    consecutive working days ending the day before date).
+    """
+    query_date = np.asarray(query_date, dtype='datetime64[ns]')
+    hist_date = np.asarray(hist_date, dtype='datetime64[ns]')
+    window_start = query_date - np.timedelta64(window_days, 'D')
+
+    # Shared integer codes so (nurse, date) pairs sort as a single int64 key
+    nurse_codes, _ = pd.factorize(np.concatenate([np.asarray(hist_nurse, dtype=object),
+                                                  np.asarray(query_nurse, dtype=object)]))
+    h_code, q_code = nurse_codes[:len(hist_date)], nurse_codes[len(hist_date):]
+    date_ranks = np.unique(np.concatenate([hist_date, query_date, window_start]))
+    stride = len(date_ranks) + 1
+    h_key = h_code * stride + np.searchsorted(date_ranks, hist_date)
+    q_key = q_code * stride + np.searchsorted(date_ranks, query_date)
+    w_key = q_code * stride + np.searchsorted(date_ranks, window_start)
+
+    order = np.argsort(h_key, kind='stable')
+    h_key, h_code, h_date = h_key[order], h_code[order], hist_date[order]
+    h_hours = np.asarray(hist_hours)[order]
+
+    # Searching in key order keeps memory access sequential; window keys share that order
+    q_order = np.argsort(q_key, kind='stable')
+    hi = np.empty(len(q_key), dtype=np.int64)
+    lo = np.empty(len(q_key), dtype=np.int64)
+    hi[q_order] = np.searchsorted(h_key, q_key[q_order], side='left')
+    lo[q_order] = np.searchsorted(h_key, w_key[q_order], side='left')
+
+    # Hours in window: difference of the running total at both window edges
+    cum_hours = np.concatenate([np.zeros(1, dtype=h_hours.dtype), np.cumsum(h_hours)])
+    hours = cum_hours[hi] - cum_hours[lo]
+
+    # Latest earlier shift for the same nurse sits just before the query position
+    prev = hi - 1
+    has_prev = prev >= 0
+    has_prev[has_prev] = h_code[prev[has_prev]] == q_code[has_prev]
+    prev_date = np.full(len(query_date), np.datetime64('NaT'), dtype='datetime64[ns]')
+    prev_date[has_prev] = h_date[prev[has_prev]]
+
+    # Run length of back-to-back days ending at each history row. A repeated date breaks
+    # the run, mirroring the day-by-day walk in add_consecutive_work_days.
+    one_day = np.timedelta64(1, 'D')
+    continues = np.zeros(len(h_key), dtype=bool)
+    continues[1:] = (h_code[1:] == h_code[:-1]) & (h_date[1:] - h_date[:-1] == one_day)
+    run_start = np.maximum.accumulate(np.where(continues, 0, np.arange(len(h_key))))
+    run_length = np.arange(len(h_key)) - run_start + 1
+    streak = np.zeros(len(query_date), dtype=np.int64)
+    on_previous_day = has_prev & (query_date - prev_date == one_day)
+    streak[on_previous_day] = run_length[prev[on_previous_day]]
+
+    return hours, prev_date, streak
+
+def _history_columns(df, assigned_df):
+    """Compute (hours_last_2wks, days_since_last_shift, consecutive_work_days) arrays for df."""
+    hours, prev_date, streak = _history_lookup(
+        df['nurse_id'].to_numpy(), df['date'].to_numpy(),
+        assigned_df['nurse_id'].to_numpy(), assigned_df['date'].to_numpy(),
+        assigned_df['duration_hours'].to_numpy()
+    )
+    days_since = (df['date'].to_numpy(dtype='datetime64[ns]') - prev_date) / np.timedelta64(1, 'D')
+    return hours, np.floor(days_since), streak
+
+def add_history_features(df, assigned_df):
+    """
+    Vectorized replacement for add_total_hours_in_fortnight, add_days_since_last_shift and
+    add_consecutive_work_days. Adds the same three columns with the same values.
+    Assumes dates are calendar days (no time component), as produced by the pipeline.
+    """
+    for col, values in zip(HISTORY_FEATURES, _history_columns(df, assigned_df)):
+        df[col] = values
+    return df
+
+def add_history_features_incremental(df, assigned_df, store):
+    """
+    Same columns as add_history_features without a pass over the full history: rows dated
+    after the store watermark are resolved against the store's per-nurse recent shifts plus
+    the assignments appended since, and rows on or before it read the features the store
+    saved when their (nurse_id, date) was ingested. Only rows before the watermark on a day
+    the nurse had no ingested assignment (rare, e.g. back-dated candidates) fall back to
+    assigned_df.
+    """
+    watermark = store.watermark
+    if watermark is None:
+        return add_history_features(df, assigned_df)
+
+    after = (df['date'] > watermark).to_numpy()
+    recent = pd.concat(
+        [store.recent_shifts(), assigned_df.loc[assigned_df['date'] > watermark, store.SHIFT_COLS]],
+        ignore_index=True
+    )
+    columns = [np.full(len(df), np.nan) for _ in HISTORY_FEATURES]
+    for values, new in zip(columns, _history_columns(df[after], recent)):
+        values[after] = new
+
+    before = np.flatnonzero(~after)
+    if len(before):
+        stored = store.history_features()
+        pos = pd.MultiIndex.from_arrays([stored['nurse_id'].astype(str), stored['date']]).get_indexer(
+            pd.MultiIndex.from_arrays([df['nurse_id'].iloc[before].astype(str), df['date'].iloc[before]]))
+        found, missing = before[pos >= 0], before[pos < 0]
+        for values, col in zip(columns, HISTORY_FEATURES):
+            values[found] = stored[col].to_numpy(dtype=float)[pos[pos >= 0]]
+        if len(missing):
+            for values, old in zip(columns, _history_columns(df.iloc[missing], assigned_df)):
+                values[missing] = old
+
+    # Same dtypes as add_history_features: hours follow duration_hours, streaks are counts
+    dtypes = [assigned_df['duration_hours'].to_numpy().dtype, float, np.int64]
+    for col, values, dtype in zip(HISTORY_FEATURES, columns, dtypes):
+        df[col] = values.astype(dtype)
+    return df
+
 def add_shift_and_ward_features(df):
     """Add features: day_of_week, one-hot shift, one-hot ward."""
     df['day_of_week'] = df['date'].dt.dayofweek
@@ -66,17 +186,21 @@ def add_shift_and_ward_features(df):
     df = pd.concat([df, shift_onehot, ward_onehot], axis=1)
     return df
 
-def feature_engineering(edge_df):
+def feature_engineering(edge_df, store=None):
     """
     Main entry: Add all features to edge_df.
     Assumes edge_df['date'] is already pd.Timestamp and that 'label' column exists.
+    If a NurseFeatureStore is given, rows after its watermark are computed from the store
+    and the store is then updated with the newly appended assignments.
     """
     # Only use label==1 for historical assignment-based features
     assigned_df = edge_df[edge_df['label'] == 1].copy()
 
-    # Apply each feature function
-    edge_df = add_total_hours_in_fortnight(edge_df, assigned_df)
-    edge_df = add_days_since_last_shift(edge_df, assigned_df)
-    edge_df = add_consecutive_work_days(edge_df, assigned_df)
+    # Apply each feature function (history features share one sorted pass)
+    if store is None:
+        edge_df = add_history_features(edge_df, assigned_df)
+    else:
+        edge_df = add_history_features_incremental(edge_df, assigned_df, store)
+        store.update(assigned_df)
     edge_df = add_shift_and_ward_features(edge_df)
     return edge_df
\ No newline at end of file
@@ -0,0 +1,158 @@
+# src/preprocessing/feature_store.py
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.feature_engineering import HISTORY_FEATURES, _history_lookup, add_history_features
+
+class NurseFeatureStore:
+    """
+    Persistent per-nurse history state backed by SQLite, so day-over-day pipeline runs
+    only ingest newly appended assignments instead of rebuilding features from scratch.
+
+    Tables:
+      - nurse_state: last_shift_date, streak_len (consecutive days ending at the last shift)
+        and hours_last_2wks (rolling hours up to the watermark), one row per nurse.
+      - recent_shifts: the assignment rows still needed to answer queries after the
+        watermark (the rolling window, plus each nurse's last shift and current streak).
+      - history_features: hours_last_2wks, days_since_last_shift and consecutive_work_days
+        per (nurse_id, date) of every ingested assignment. Features only look back in time,
+        so they are final once ingested and later runs read them instead of recomputing.
+      - meta: the watermark, i.e. the latest assignment date ingested.
+    """
+    SHIFT_COLS = ['nurse_id', 'date', 'duration_hours']
+
+    def __init__(self, path="data/feature_store.sqlite", window_days=13):
+        self.path = path
+        self.window_days = window_days
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    @property
+    def watermark(self):
+        """Latest assignment date ingested, or None for an empty store."""
+        with self._connect() as con:
+            row = con.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        return pd.Timestamp(row[0]) if row else None
+
+    def recent_shifts(self):
+        """Stored assignment rows (nurse_id, date, duration_hours); O(nurses) in size."""
+        if self.watermark is None:
+            return pd.DataFrame({
+                'nurse_id': pd.Series(dtype=object),
+                'date': pd.Series(dtype='datetime64[ns]'),
+                'duration_hours': pd.Series(dtype=np.int64),
+            })
+        with self._connect() as con:
+            df = pd.read_sql("SELECT nurse_id, date, duration_hours FROM recent_shifts", con)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def history_features(self):
+        """Stored history features, one row per (nurse_id, date) ingested so far."""
+        if self.watermark is None:
+            return pd.DataFrame(columns=['nurse_id', 'date'] + HISTORY_FEATURES)
+        with self._connect() as con:
+            df = pd.read_sql("SELECT * FROM history_features", con)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def nurse_state(self):
+        """Per-nurse state table as of the watermark."""
+        with self._connect() as con:
+            df = pd.read_sql("SELECT * FROM nurse_state", con)
+        df['last_shift_date'] = pd.to_datetime(df['last_shift_date'])
+        return df
+
+    def update(self, assigned_df):
+        """
+        Ingest assignment rows dated after the watermark and advance it.
+        Rows on or before the watermark are ignored; use rebuild() after back-dated edits.
+        Returns the number of rows ingested.
+        """
+        watermark = self.watermark
+        new_rows = assigned_df[self.SHIFT_COLS]
+        if watermark is not None:
+            new_rows = new_rows[new_rows['date'] > watermark]
+        if new_rows.empty:
+            return 0
+
+        shifts = pd.concat([self.recent_shifts(), new_rows], ignore_index=True)
+        watermark = shifts['date'].max()
+
+        # Features of the new rows only need the stored tail plus the new rows themselves
+        features = add_history_features(
+            new_rows[['nurse_id', 'date']].drop_duplicates().reset_index(drop=True), shifts)
+
+        # Per-nurse state from one engine pass: querying the day after the last shift
+        # yields the streak ending on it; querying the day after the watermark the rolling hours.
+        last = shifts.groupby('nurse_id', sort=False)['date'].max()
+        _, _, streak = _history_lookup(
+            last.index.to_numpy(), last.to_numpy() + np.timedelta64(1, 'D'),
+            shifts['nurse_id'].to_numpy(), shifts['date'].to_numpy(), shifts['duration_hours'].to_numpy(),
+            window_days=self.window_days
+        )
+        hours, _, _ = _history_lookup(
+            last.index.to_numpy(), np.full(len(last), watermark + pd.Timedelta(days=1)),
+            shifts['nurse_id'].to_numpy(), shifts['date'].to_numpy(), shifts['duration_hours'].to_numpy(),
+            window_days=self.window_days
+        )
+        state = pd.DataFrame({
+            'nurse_id': last.index,
+            'last_shift_date': last.to_numpy(),
+            'streak_len': streak,
+            'hours_last_2wks': hours,
+        })
+
+        # Keep only rows a later query can still see: the rolling window and the current streak
+        window_start = watermark + pd.Timedelta(days=1 - self.window_days)
+        streak_start = state['last_shift_date'] - pd.to_timedelta(state['streak_len'] - 1, unit='D')
+        keep_from = streak_start.clip(upper=window_start)
+        keep_from.index = state['nurse_id']
+        shifts = shifts[shifts['date'] >= shifts['nurse_id'].map(keep_from)]
+
+        with self._connect() as con:
+            self._to_sql(shifts, 'recent_shifts', con)
+            self._to_sql(state, 'nurse_state', con)
+            self._to_sql(features, 'history_features', con, if_exists='append')
+            con.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)",
+                (watermark.strftime('%Y-%m-%d'),)
+            )
+        print(f"[feature_store] Ingested {len(new_rows)} new rows, watermark {watermark.date()}")
+        return len(new_rows)
+
+    def rebuild(self, assigned_df):
+        """Drop all stored state and ingest assigned_df from scratch."""
+        with self._connect() as con:
+            con.execute("DROP TABLE IF EXISTS recent_shifts")
+            con.execute("DROP TABLE IF EXISTS nurse_state")
+            con.execute("DROP TABLE IF EXISTS history_features")
+            con.execute("DELETE FROM meta")
+        return self.update(assigned_df)
+
+    def lookup(self, df):
+        """
+        Add hours_last_2wks, days_since_last_shift and consecutive_work_days to df using
+        only stored state. Every row must be dated after the watermark.
+        """
+        watermark = self.watermark
+        if watermark is not None and (df['date'] <= watermark).any():
+            raise ValueError(f"lookup() only covers dates after the watermark ({watermark.date()})")
+        return add_history_features(df, self.recent_shifts())
+
+    @staticmethod
+    def _to_sql(df, table, con, if_exists='replace'):
+        df = df.copy()
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].dt.strftime('%Y-%m-%d')
+        df.to_sql(table, con, if_exists=if_exists, index=False)
@@ -1,75 +1,136 @@
 # src/dataprep/graphconstruction.py
 
+import os
+
+import numpy as np
+import pandas as pd
 import torch
 from torch_geometric.data import Data
 
-def build_graph(edge_df, save_mapping_dir="src"):
-    edge_df = edge_df.copy()
+from src.preprocessing.candidates import SHIFT_KEY
 
-    # Build unique shift_id using all relevant columns
-    if 'shift_id' not in edge_df.columns:
-        edge_df['shift_id'] = (
-            edge_df['date'].astype(str) + "_" +
-            edge_df['shift'].astype(str) + "_" +
-            edge_df['ward'].astype(str) + "_" +
-            edge_df['start_time'].astype(str) + "_" +
-            edge_df['end_time'].astype(str)
-        )
+# Edge feature columns and the scale each is divided by, so inputs stay roughly in [0, 1].
+# Columns missing from edge_df are filled with 0. Only features that exist on both training
+# (history) and candidate rows belong here: is_preferred is unknown for past assignments, so
+# preferences reach the roster through the solver's preference_weight instead.
+EDGE_FEATURES = {
+    'hours_last_2wks': 80.0,
+    'days_since_last_shift': 14.0,
+    'consecutive_work_days': 7.0,
+}
 
-    # Nurse and shift index mapping
-    nurse2idx = {n: i for i, n in enumerate(edge_df['nurse_id'].unique())}
-    shift2idx = {s: i + len(nurse2idx) for i, s in enumerate(edge_df['shift_id'].unique())}
+def factorize_rows(df, cols):
+    """
+    Integer codes (in order of first appearance) for the distinct rows of df[cols].
+    Columns are factorized one at a time and folded into a compact int64 key, so no
+    per-row string keys are built.
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    for col in cols:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        key, _ = pd.factorize(key * len(uniques) + codes)
+    return key
 
-    # Assign indices
-    edge_df['nurse_idx'] = edge_df['nurse_id'].map(nurse2idx)
-    edge_df['shift_idx'] = edge_df['shift_id'].map(shift2idx)
+def _edge_features(edge_df):
+    """Dense float32 (num_edges, len(EDGE_FEATURES) + 1) matrix; last column flags no previous shift."""
+    attrs = np.zeros((len(edge_df), len(EDGE_FEATURES) + 1), dtype=np.float32)
+    for j, (col, scale) in enumerate(EDGE_FEATURES.items()):
+        if col in edge_df.columns:
+            attrs[:, j] = edge_df[col].to_numpy(dtype=np.float32) / scale
+    if 'days_since_last_shift' in edge_df.columns:
+        attrs[:, -1] = edge_df['days_since_last_shift'].isna().to_numpy()
+    return np.nan_to_num(attrs, nan=0.0)
 
-    # Edge index for PyG
-    edge_index = torch.tensor([
-        edge_df['nurse_idx'].values,
-        edge_df['shift_idx'].values
-    ], dtype=torch.long)
+def _one_hot(values, categories):
+    """float32 one-hot rows over a fixed vocabulary; unknown values get an all-zero row."""
+    codes = pd.Index(categories).get_indexer(values)
+    out = np.zeros((len(codes), len(categories)), dtype=np.float32)
+    known = codes >= 0
+    out[np.flatnonzero(known), codes[known]] = 1
+    return out
+
+def _shift_features(shift_rows, shift_types, wards):
+    """Dense float32 features per shift node: one-hot shift type and ward, day, duration, start hour."""
+    start_hour = pd.to_numeric(shift_rows['start_time'].astype(str).str.slice(0, 2), errors='coerce')
+    scalars = np.column_stack([
+        pd.to_datetime(shift_rows['date']).dt.dayofweek.to_numpy() / 6.0,
+        shift_rows['duration_hours'].to_numpy(dtype=np.float32) / 12.0,
+        start_hour.to_numpy(dtype=np.float32) / 24.0,
+    ]).astype(np.float32)
+    onehots = [_one_hot(shift_rows['shift'], shift_types), _one_hot(shift_rows['ward'], wards)]
+    return np.nan_to_num(np.hstack(onehots + [scalars]), nan=0.0)
 
-    num_nurses = len(nurse2idx)
-    num_shifts = len(shift2idx)
+def build_graph(edge_df, save_mapping_dir=None, shift_types=None, wards=None):
+    """
+    Build the bipartite nurse-shift PyG graph. Nurse nodes come first (0..N-1), followed
+    by shift nodes; edges keep the row order of edge_df.
+
+    Node features x = [is_shift | nurse block | shift block]: nurses carry the mean of their
+    edge features, shifts carry one-hot shift type and ward plus day of week, duration and
+    start hour. edge_attr holds the engineered history features per edge. Pass the same
+    shift_types/wards vocabularies for every graph a model sees so feature widths agree
+    (defaults to the sorted values present in edge_df).
+
+    Returns (data, index_maps) where index_maps = {'nurse': nurse_idx_map, 'shift': shift_idx_map}
+    are DataFrames for mapping node indices back to nurses and shifts. The maps are also
+    written as CSV if save_mapping_dir is given.
+    """
+    # Nurse and shift index mapping
+    nurse_codes, nurse_ids = pd.factorize(edge_df['nurse_id'])
+    shift_codes = factorize_rows(edge_df, SHIFT_KEY)
+    num_nurses = len(nurse_ids)
+    num_shifts = int(shift_codes.max()) + 1 if len(shift_codes) else 0
     num_nodes = num_nurses + num_shifts
 
-    # Node type encoding: 0=nurse, 1=shift
-    x = torch.zeros((num_nodes, 1))
+    # Edge index for PyG
+    edge_index = torch.from_numpy(np.stack([nurse_codes, shift_codes + num_nurses]).astype(np.int64))
+
+    # Edge features, and nurse node features as the mean over each nurse's edges
+    edge_attr = _edge_features(edge_df)
+    edges_per_nurse = np.maximum(np.bincount(nurse_codes, minlength=num_nurses), 1)
+    nurse_x = np.column_stack([
+        np.bincount(nurse_codes, weights=edge_attr[:, j], minlength=num_nurses) / edges_per_nurse
+        for j in range(edge_attr.shape[1])
+    ]).astype(np.float32)
+
+    # Shift node features from the first row of each shift
+    first_rows = np.unique(shift_codes, return_index=True)[1]
+    shift_rows = edge_df.iloc[first_rows]
+    if shift_types is None:
+        shift_types = sorted(edge_df['shift'].unique())
+    if wards is None:
+        wards = sorted(edge_df['ward'].unique())
+    shift_x = _shift_features(shift_rows, shift_types, wards)
+
+    # Node type encoding: 0=nurse, 1=shift, followed by the nurse and shift blocks
+    nurse_width, shift_width = nurse_x.shape[1], shift_x.shape[1]
+    x = np.zeros((num_nodes, 1 + nurse_width + shift_width), dtype=np.float32)
     x[num_nurses:, 0] = 1
+    x[:num_nurses, 1:1 + nurse_width] = nurse_x
+    x[num_nurses:, 1 + nurse_width:] = shift_x
 
     y = torch.tensor(edge_df['label'].values, dtype=torch.float)
 
-    # ----- Save index mappings for postprocessing -----
-    import os
-    import pandas as pd
+    # ----- Index mappings for postprocessing -----
+    nurse_idx_map = pd.DataFrame({'nurse_idx': np.arange(num_nurses), 'nurse_id': nurse_ids})
 
-    # Save nurse mapping
-    nurse_idx_map = (
-        edge_df[['nurse_idx', 'nurse_id']]
-        .drop_duplicates()
-        .sort_values('nurse_idx')
-    )
-    nurse_map_path = os.path.join(save_mapping_dir, "nurse_idx_map.csv")
-    nurse_idx_map.to_csv(nurse_map_path, index=False)
-
-    # Save shift mapping (now includes duration_hours)
-    shift_idx_map = (
-        edge_df[['shift_idx', 'shift_id', 'date', 'shift', 'ward', 'start_time', 'end_time', 'duration_hours']]
-        .drop_duplicates()
-        .sort_values('shift_idx')
-    )
-    shift_map_path = os.path.join(save_mapping_dir, "shift_idx_map.csv")
-    shift_idx_map.to_csv(shift_map_path, index=False)
+    # One row per shift node (first occurrence carries duration_hours)
+    shift_idx_map = shift_rows[SHIFT_KEY + ['duration_hours']].reset_index(drop=True)
+    shift_idx_map.insert(0, 'shift_idx', np.arange(num_shifts) + num_nurses)
 
-    print(f"Saved nurse mapping to {nurse_map_path}")
-    print(f"Saved shift mapping to {shift_map_path}")
+    if save_mapping_dir is not None:
+        nurse_map_path = os.path.join(save_mapping_dir, "nurse_idx_map.csv")
+        shift_map_path = os.path.join(save_mapping_dir, "shift_idx_map.csv")
+        nurse_idx_map.to_csv(nurse_map_path, index=False)
+        shift_idx_map.to_csv(shift_map_path, index=False)
+        print(f"Saved nurse mapping to {nurse_map_path}")
+        print(f"Saved shift mapping to {shift_map_path}")
 
     # ----- Return PyG Data object -----
     data = Data(
-        x=x,
+        x=torch.from_numpy(x),
         edge_index=edge_index,
-        edge_attr=None,
+        edge_attr=torch.from_numpy(edge_attr),
         y=y
     )
-    return data
+    return data, {'nurse': nurse_idx_map, 'shift': shift_idx_map}
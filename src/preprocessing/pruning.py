@@ -0,0 +1,104 @@
+# src/preprocessing/pruning.py
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.candidates import SHIFT_KEY
+
+def shift_intervals(df):
+    """
+    Start and end timestamps for each row from date + 'HH:MM' start/end times.
+    Shifts whose end_time is not after start_time run past midnight.
+    """
+    def clock(col):
+        # Parse each distinct 'HH:MM' once, then broadcast
+        times = df[col].astype(str)
+        uniques = pd.unique(times)
+        offsets = pd.Series(pd.to_timedelta([t + ':00' for t in uniques]), index=uniques)
+        return times.map(offsets).to_numpy()
+
+    date = df['date'].to_numpy(dtype='datetime64[ns]')
+    start = date + clock('start_time')
+    end = date + clock('end_time')
+    end = np.where(end <= start, end + np.timedelta64(1, 'D'), end)
+    return start, end
+
+def _unqualified_ward(candidate_df, history_df):
+    """Edges for a (nurse, ward) pair that never appears in the assignment history."""
+    nurses = pd.Index(pd.unique(pd.concat([candidate_df['nurse_id'], history_df['nurse_id']])))
+    wards = pd.Index(pd.unique(pd.concat([candidate_df['ward'], history_df['ward']])))
+    def pair_key(df):
+        return nurses.get_indexer(df['nurse_id']) * len(wards) + wards.get_indexer(df['ward'])
+    return ~np.isin(pair_key(candidate_df), pair_key(history_df))
+
+def _conflicts_with_committed(candidate_df, committed_df, min_rest_hours):
+    """
+    (overlap, short_rest) masks for edges that clash with a shift the nurse is already
+    committed to. The committed shift itself is not treated as a clash.
+    """
+    overlap = np.zeros(len(candidate_df), dtype=bool)
+    short_rest = np.zeros(len(candidate_df), dtype=bool)
+    if committed_df is None or committed_df.empty or candidate_df.empty:
+        return overlap, short_rest
+
+    rest = pd.Timedelta(hours=min_rest_hours or 0)
+    cand_start, cand_end = shift_intervals(candidate_df)
+    com_start, com_end = shift_intervals(committed_df)
+
+    # Only committed shifts close enough to the window can clash
+    near = (com_end > cand_start.min() - rest) & (com_start < cand_end.max() + rest)
+    committed = committed_df.loc[near, ['nurse_id'] + SHIFT_KEY].assign(
+        com_start=com_start[near], com_end=com_end[near]
+    )
+    cand = candidate_df[['nurse_id'] + SHIFT_KEY].assign(
+        row=np.arange(len(candidate_df)), cand_start=cand_start, cand_end=cand_end
+    )
+    pairs = cand.merge(committed, on='nurse_id', suffixes=('', '_com'))
+    same_shift = np.logical_and.reduce([
+        (pairs[col] == pairs[f'{col}_com']).to_numpy() for col in SHIFT_KEY
+    ])
+    pairs = pairs[~same_shift]
+
+    overlaps = (pairs['cand_start'] < pairs['com_end']) & (pairs['com_start'] < pairs['cand_end'])
+    overlap[pairs.loc[overlaps, 'row'].to_numpy()] = True
+    if min_rest_hours:
+        gap = np.maximum(pairs['cand_start'] - pairs['com_end'], pairs['com_start'] - pairs['cand_end'])
+        too_close = ~overlaps & (gap < rest)
+        short_rest[pairs.loc[too_close, 'row'].to_numpy()] = True
+    return overlap, short_rest
+
+def prune_candidates(
+    candidate_df,
+    history_df,
+    committed_df=None,
+    ward_qualification=True,
+    min_rest_hours=None
+):
+    """
+    Drop candidate nurse-shift edges that can never be feasible, before graph construction:
+      - ward_qualification: the nurse has never been assigned to that ward in history_df
+      - overlap: the shift overlaps one the nurse is already committed to (committed_df)
+      - rest: fewer than min_rest_hours between the shift and a committed one
+    Each rule only counts edges not already removed by an earlier one.
+    Returns (pruned_df, report) where report maps rule -> edges removed.
+    """
+    keep = np.ones(len(candidate_df), dtype=bool)
+    report = {}
+
+    if ward_qualification:
+        drop = _unqualified_ward(candidate_df, history_df)
+        report['ward_qualification'] = int((keep & drop).sum())
+        keep &= ~drop
+
+    overlap, short_rest = _conflicts_with_committed(candidate_df, committed_df, min_rest_hours)
+    if committed_df is not None:
+        report['overlap'] = int((keep & overlap).sum())
+        keep &= ~overlap
+    if committed_df is not None and min_rest_hours:
+        report['rest'] = int((keep & short_rest).sum())
+        keep &= ~short_rest
+
+    report['total'] = int((~keep).sum())
+    detail = ", ".join(f"{rule}: {n}" for rule, n in report.items() if rule != 'total')
+    print(f"[pruning] Removed {report['total']} of {len(candidate_df)} candidate edges ({detail})")
+    return candidate_df[keep].reset_index(drop=True), report
@@ -0,0 +1,383 @@
+# src/runner.py
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing.feature_engineering import feature_engineering, add_history_features_incremental
+from src.preprocessing.feature_store import NurseFeatureStore
+from src.preprocessing.candidates import load_preferences, generate_candidates
+from src.preprocessing.pruning import prune_candidates
+from src.preprocessing.graphconstruction import build_graph
+from src.model.model import train_gat, predict_gat, load_gat
+from src.model.checkpoint import config_hash, data_hash, load_latest_checkpoint
+
+from src.postprocessing.postprocessing import attach_edge_mappings
+from src.postprocessing.assignmentsolver import optimize_assignment
+from src.postprocessing.decomposition import solve_decomposed
+from src.postprocessing.rolling_horizon import solve_rolling
+from src.postprocessing.metrics import preference_match, roster_metrics
+from src.utils.io import with_table_dtypes, write_table
+from src.utils.profiling import StageProfiler, describe_outputs
+
+class Stage:
+    """
+    One pipeline step. run(cfg, inputs) gets the outputs of the stages in `inputs` as
+    {stage: {output: value}} and must return exactly the names in `outputs`.
+    The cache key covers the `config` keys (dotted paths into config.yaml), the contents
+    of the `files` (dotted config paths naming input files) and the upstream keys.
+    """
+    def __init__(self, name, run, outputs, inputs=(), config=(), files=()):
+        self.name = name
+        self.run = run
+        self.outputs = tuple(outputs)
+        self.inputs = tuple(inputs)
+        self.config = tuple(config)
+        self.files = tuple(files)
+
+def config_value(cfg, dotted):
+    """cfg['a']['b'] for 'a.b'; None if any part is missing."""
+    value = cfg
+    for part in dotted.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def file_hash(path):
+    """Short sha256 of a file's bytes, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def save_stage(cfg, df, name):
+    """Persist a stage output as configured: columnar intermediate and/or CSV export."""
+    data_dir = cfg['paths']['data_dir']
+    paths = []
+    if cfg['io']['intermediate_format']:
+        paths.append(write_table(df, os.path.join(data_dir, f"{name}.{cfg['io']['intermediate_format']}")))
+    if cfg['io']['export_csv']:
+        paths.append(write_table(df, os.path.join(data_dir, f"{name}.csv")))
+    return paths
+
+# --- Stages ---
+
+def run_features(cfg, inputs):
+    # All history for training; the store keeps per-nurse state between runs
+    df = pd.read_csv(cfg['paths']['combined_csv'])
+    df['date'] = pd.to_datetime(df['date'])
+    df = feature_engineering(df, store=NurseFeatureStore(cfg['paths']['feature_store']))
+    return {'history': df, 'train_assigned': df[df['label'] == 1].copy()}
+
+def run_candidates(cfg, inputs):
+    history = inputs['features']['history']
+    train_assigned = inputs['features']['train_assigned']
+    pref_df = load_preferences(cfg['paths']['preference_csv'])
+    candidate_df = generate_candidates(history['nurse_id'].unique(), pref_df)
+
+    # History features for the live window come from the per-nurse store (rows on or
+    # before its watermark fall back to the full assignment history)
+    store = NurseFeatureStore(cfg['paths']['feature_store'])
+    candidate_df = add_history_features_incremental(candidate_df, train_assigned, store)
+
+    # Optionally drop edges that can never be feasible (history shifts bound rest at window start)
+    if cfg['pruning']['enabled']:
+        candidate_df, _ = prune_candidates(
+            candidate_df,
+            history_df=train_assigned,
+            committed_df=train_assigned,
+            ward_qualification=cfg['pruning']['ward_qualification'],
+            min_rest_hours=cfg['pruning']['min_rest_hours']
+        )
+    print(f"Generated {candidate_df.shape[0]} candidate nurse-shift edges for live scheduling.")
+    return {'candidate_df': candidate_df, 'pref_df': pref_df}
+
+def run_graph(cfg, inputs):
+    history = inputs['features']['history']
+    # Shared vocabularies keep node feature widths identical across train and test graphs
+    shift_types = sorted(history['shift'].unique())
+    wards = sorted(history['ward'].unique())
+    train_graph, _ = build_graph(inputs['features']['train_assigned'], shift_types=shift_types, wards=wards)
+    test_graph, test_maps = build_graph(inputs['candidates']['candidate_df'], shift_types=shift_types, wards=wards)
+    return {
+        'train_graph': train_graph,
+        'test_graph': test_graph,
+        'test_maps': test_maps,
+        'vocab': {'shift_types': shift_types, 'wards': wards},
+    }
+
+def run_train(cfg, inputs):
+    # Skipped or warm-started from the latest checkpoint
+    train_assigned = inputs['features']['train_assigned']
+    train_graph = inputs['graph']['train_graph']
+    vocab = inputs['graph']['vocab']
+    model_args = dict(
+        in_dim=train_graph.x.shape[1],
+        hidden_dim=cfg['model']['gat_hidden_dim'],
+        out_dim=1,
+        heads=cfg['model']['gat_heads'],
+        edge_dim=train_graph.edge_attr.shape[1] if cfg['model']['use_edge_features'] else None
+    )
+    train_cfg_hash = config_hash({
+        **model_args,
+        'epochs': cfg['model']['gat_epochs'],
+        'lr': cfg['model']['gat_lr'],
+        'batch_size': cfg['model']['batch_size'],
+        'num_neighbors': cfg['model']['num_neighbors'],
+        **vocab,
+    })
+    train_data_hash = data_hash(train_assigned)
+    checkpoint_dir = cfg['paths']['checkpoint_dir']
+    latest = load_latest_checkpoint(checkpoint_dir)
+
+    if latest is not None and latest['config_hash'] == train_cfg_hash and latest['data_hash'] == train_data_hash:
+        print("Training data and config unchanged since last checkpoint; skipping training.")
+        return {'model': load_gat(latest)}
+
+    # Only new data may warm-start: any change to the model, training settings or
+    # vocabularies (all in the config hash) retrains from scratch
+    new_assigned = train_assigned.iloc[:0]
+    if latest is not None and cfg['model']['warm_start'] and latest['config_hash'] == train_cfg_hash:
+        new_assigned = train_assigned[train_assigned['date'] > pd.Timestamp(latest['data_watermark'])]
+        if new_assigned.empty:
+            # Same watermark but different data (e.g. back-dated edits): nothing to fine-tune on
+            print(f"Data changed before checkpoint v{latest['version']}'s watermark; training from scratch.")
+    elif latest is not None:
+        print(f"Training config differs from checkpoint v{latest['version']}; training from scratch.")
+    warm_start = not new_assigned.empty
+    fit_graph, epochs = train_graph, cfg['model']['gat_epochs']
+    if warm_start:
+        # Fine-tune only on assignments added since the checkpoint
+        fit_graph, _ = build_graph(new_assigned, **vocab)
+        epochs = cfg['model']['finetune_epochs']
+        print(f"Warm-starting from checkpoint v{latest['version']} on {fit_graph.edge_index.shape[1]} new edges.")
+    model = train_gat(
+        fit_graph,
+        **model_args,
+        epochs=epochs,
+        lr=cfg['model']['gat_lr'],
+        batch_size=cfg['model']['batch_size'],
+        num_neighbors=cfg['model']['num_neighbors'],
+        num_workers=cfg['model']['num_workers'],
+        checkpoint=latest if warm_start else None,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_meta={
+            'model_args': model_args,
+            'config_hash': train_cfg_hash,
+            'data_hash': train_data_hash,
+            'data_watermark': str(train_assigned['date'].max().date()),
+        }
+    )
+    return {'model': model}
+
+def run_predict(cfg, inputs):
+    # predict_gat streams scores block by block into the paths.edge_scores .npy memmap, so
+    # scoring never holds every edge's activations. The stage output is a plain in-memory
+    # copy: it is pickled into the cache and becomes an edge-table column right after.
+    gat_scores = predict_gat(
+        inputs['train']['model'],
+        inputs['graph']['test_graph'],
+        chunk_size=cfg['model']['predict_chunk_size'],
+        out_path=cfg['paths']['edge_scores']
+    )
+    print(f"Scored {len(gat_scores)} candidate edges into {cfg['paths']['edge_scores']}")
+    return {'scores': np.array(gat_scores)}
+
+def run_postprocess(cfg, inputs):
+    test_graph = inputs['graph']['test_graph']
+    test_maps = inputs['graph']['test_maps']
+    df_edges = pd.DataFrame(test_graph.edge_index.cpu().numpy().T, columns=['nurse_node', 'shift_node'])
+    # Copies the scores into the frame; the .npy file stays the only memory-mapped copy
+    df_edges['gat_score'] = inputs['predict']['scores']
+    edges = with_table_dtypes(attach_edge_mappings(df_edges, test_maps['nurse'], test_maps['shift']))
+    # build_graph keeps candidate row order, so preference flags line up with the edges
+    edges['is_preferred'] = inputs['candidates']['candidate_df']['is_preferred'].to_numpy()
+    return {'edges': edges}
+
+def run_solve(cfg, inputs):
+    # Monolithic by default, optionally decomposed or rolling-horizon
+    edges = inputs['postprocess']['edges']
+    solver_cfg = cfg['solver']
+    common = dict(
+        hours_per_fortnight=cfg['hours_per_fortnight'],
+        ward_requirements=cfg.get('ward_requirements'),
+        backend=solver_cfg['backend'],
+        time_limit_s=solver_cfg['time_limit_s'],
+        preference_weight=cfg.get('preference_weight', 0.0)
+    )
+    if solver_cfg.get('decompose'):
+        assignment, stats = solve_decomposed(
+            edges,
+            split_by=solver_cfg['decompose'],
+            block_days=solver_cfg.get('block_days', 7),
+            max_workers=solver_cfg.get('max_workers'),
+            **common
+        )
+    elif solver_cfg.get('rolling_window_days'):
+        assignment, stats = solve_rolling(
+            edges,
+            window_days=solver_cfg['rolling_window_days'],
+            commit_days=solver_cfg.get('rolling_commit_days', 14),
+            # Rest-based pruning across windows follows the pruning switch like candidate pruning
+            min_rest_hours=cfg['pruning']['min_rest_hours'] if cfg['pruning']['enabled'] else None,
+            num_workers=solver_cfg['num_workers'],
+            **common
+        )
+    else:
+        assignment, stats = optimize_assignment(edges, num_workers=solver_cfg['num_workers'], **common)
+    if assignment is None:
+        print("No feasible solution found.")
+        assignment = edges.iloc[:0]
+    return {'assignment': assignment, 'stats': stats}
+
+def run_metrics(cfg, inputs):
+    # Edges and roster are exported here rather than in postprocess/solve, so io settings
+    # never invalidate the solve cache and re-run the MIP
+    edges, assignment = inputs['postprocess']['edges'], inputs['solve']['assignment']
+    print(f"Readable edge list for assignment: {save_stage(cfg, edges, 'edges_with_scores_readable')}")
+    print(f"Final UI assignment output: {save_stage(cfg, assignment, 'assignment_ui_output')}")
+    metric_df, match_rate, nurse_pref_score = preference_match(assignment, inputs['candidates']['pref_df'])
+    print(f"Detailed match evaluation exported to: {save_stage(cfg, metric_df, 'metric')}")
+    # Fairness and coverage of the chosen rows against all candidate edges
+    summary, nurse_df, coverage_df = roster_metrics(
+        edges,
+        assignment,
+        hours_per_fortnight=cfg['hours_per_fortnight'],
+        ward_requirements=cfg.get('ward_requirements')
+    )
+    save_stage(cfg, nurse_df, 'nurse_metrics')
+    save_stage(cfg, coverage_df, 'coverage_metrics')
+    return {
+        'metric_df': metric_df,
+        'match_rate': match_rate,
+        'nurse_pref_score': nurse_pref_score,
+        'roster_metrics': summary,
+        'nurse_metrics': nurse_df,
+        'coverage_metrics': coverage_df,
+    }
+
+MODEL_CONFIG = [
+    f'model.{key}' for key in (
+        'gat_hidden_dim', 'gat_heads', 'gat_epochs', 'gat_lr', 'use_edge_features',
+        'batch_size', 'num_neighbors', 'warm_start', 'finetune_epochs'
+    )
+]
+
+# Topologically ordered: every stage comes after the stages it takes inputs from
+STAGES = [
+    Stage('features', run_features, ['history', 'train_assigned'],
+          config=['paths.feature_store'], files=['paths.combined_csv']),
+    Stage('candidates', run_candidates, ['candidate_df', 'pref_df'],
+          inputs=['features'], config=['pruning'], files=['paths.preference_csv']),
+    Stage('graph', run_graph, ['train_graph', 'test_graph', 'test_maps', 'vocab'],
+          inputs=['features', 'candidates']),
+    Stage('train', run_train, ['model'],
+          inputs=['features', 'graph'], config=MODEL_CONFIG + ['paths.checkpoint_dir']),
+    Stage('predict', run_predict, ['scores'],
+          inputs=['train', 'graph'], config=['model.predict_chunk_size', 'paths.edge_scores']),
+    Stage('postprocess', run_postprocess, ['edges'],
+          inputs=['predict', 'graph', 'candidates']),
+    Stage('solve', run_solve, ['assignment', 'stats'],
+          inputs=['postprocess'],
+          config=['solver', 'hours_per_fortnight', 'ward_requirements', 'preference_weight',
+                  'pruning.enabled', 'pruning.min_rest_hours']),
+    Stage('metrics', run_metrics,
+          ['metric_df', 'match_rate', 'nurse_pref_score', 'roster_metrics', 'nurse_metrics', 'coverage_metrics'],
+          inputs=['solve', 'candidates', 'postprocess'],
+          config=['hours_per_fortnight', 'ward_requirements', 'io']),
+]
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+class PipelineRunner:
+    """
+    Cached DAG runner over STAGES. Each stage's artifacts are pickled under cache_dir keyed
+    by a content hash of its config, input files and upstream keys, so a stage re-runs only
+    when something it depends on changed (e.g. preference_weight re-runs solve and metrics,
+    not the GAT). Cached upstream artifacts are only loaded when a stage actually needs them.
+
+        runner = PipelineRunner(cfg)
+        outputs = runner.run('metrics')                  # everything not cached
+        outputs = runner.run('solve', from_stage='solve')  # force solve (and below) to re-run
+
+    Every stage (cached or not) is recorded by profiler (a StageProfiler; a silent one by
+    default) with its output row/edge counts and, for solve, the solver stats.
+    """
+    def __init__(self, cfg, cache_dir=None, profiler=None):
+        self.cfg = cfg
+        self.cache_dir = cache_dir or cfg['paths'].get('cache_dir', os.path.join(cfg['paths']['data_dir'], 'cache'))
+        self.stages = {stage.name: stage for stage in STAGES}
+        self.artifacts = {}
+        self.profiler = profiler or StageProfiler()
+
+    def keys(self):
+        """Cache key per stage, in topological order."""
+        keys = {}
+        for stage in STAGES:
+            payload = {
+                'stage': stage.name,
+                'config': {dotted: config_value(self.cfg, dotted) for dotted in stage.config},
+                'files': {dotted: file_hash(config_value(self.cfg, dotted)) for dotted in stage.files},
+                'inputs': {name: keys[name] for name in stage.inputs},
+            }
+            keys[stage.name] = hashlib.sha256(
+                json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return keys
+
+    def downstream(self, name):
+        """name and every stage that depends on it, directly or not."""
+        found = {name}
+        for stage in STAGES:
+            if found & set(stage.inputs):
+                found.add(stage.name)
+        return found
+
+    def _cache_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def _get(self, name, keys, forced, done):
+        key = keys[name]
+        if name in done:
+            return done[name]
+        if name not in forced and (name, key) in self.artifacts:
+            done[name] = self.artifacts[(name, key)]
+            return done[name]
+        stage = self.stages[name]
+        path = self._cache_path(name, key)
+        if name not in forced and os.path.exists(path):
+            with self.profiler.stage(name, key=key, cached=True) as record:
+                with open(path, 'rb') as f:
+                    outputs = pickle.load(f)
+                record.update(describe_outputs(outputs))
+            print(f"[runner] {name}: cached ({key})")
+        else:
+            inputs = {dep: self._get(dep, keys, forced, done) for dep in stage.inputs}
+            start = time.perf_counter()
+            with self.profiler.stage(name, key=key, cached=False) as record:
+                outputs = stage.run(self.cfg, inputs)
+                record.update(describe_outputs(outputs))
+            if set(outputs) != set(stage.outputs):
+                raise TypeError(f"Stage {name!r} returned {sorted(outputs)}, expected {sorted(stage.outputs)}")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            print(f"[runner] {name}: ran in {time.perf_counter() - start:.2f}s ({key})")
+        self.artifacts[(name, key)] = done[name] = outputs
+        return outputs
+
+    def run(self, until='metrics', from_stage=None):
+        """
+        Outputs of stage `until`, running whatever is missing from the cache. from_stage
+        forces that stage and everything downstream of it to re-run.
+        """
+        for name in (until, from_stage):
+            if name is not None and name not in self.stages:
+                raise ValueError(f"Unknown stage {name!r} (expected one of {STAGE_NAMES})")
+        forced = self.downstream(from_stage) if from_stage else set()
+        return self._get(until, self.keys(), forced, {})
@@ -0,0 +1,238 @@
+# src/service.py
+
+import argparse
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import torch
+import yaml
+
+from src.preprocessing.feature_engineering import add_history_features
+from src.preprocessing.feature_store import NurseFeatureStore
+from src.preprocessing.candidates import SHIFT_COLS, generate_candidates
+from src.preprocessing.graphconstruction import build_graph
+from src.model.model import predict_gat, load_gat
+from src.model.checkpoint import load_latest_checkpoint
+from src.postprocessing.postprocessing import attach_edge_mappings
+from src.postprocessing.assignmentsolver import optimize_assignment
+from src.runner import PipelineRunner
+
+class ServiceBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+class SchedulerService:
+    """
+    Resident scheduler: the GAT checkpoint, the training history, the shift/ward vocabularies
+    and the feature-store tail are loaded once, so score/solve requests only pay for
+    candidate features, one forward pass and the solve.
+
+    Requests run on a pool of `workers` threads; up to `max_queue` more may wait for a
+    worker. Beyond that submit() raises ServiceBusy instead of queueing without bound.
+    """
+    def __init__(self, cfg, workers=4, max_queue=8):
+        start = time.perf_counter()
+        self.cfg = cfg
+        checkpoint = load_latest_checkpoint(cfg['paths']['checkpoint_dir'])
+        if checkpoint is None:
+            raise FileNotFoundError(f"No GAT checkpoint in {cfg['paths']['checkpoint_dir']}; run the pipeline first")
+        self.model = load_gat(checkpoint)
+        self.model_version = checkpoint['version']
+
+        features = PipelineRunner(cfg).run('features')
+        history = features['history']
+        self.train_assigned = features['train_assigned']
+        self.nurses = history['nurse_id'].unique()
+        self.vocab = {'shift_types': sorted(history['shift'].unique()), 'wards': sorted(history['ward'].unique())}
+
+        # Feature state after the store watermark: the stored tail plus anything newer
+        store = NurseFeatureStore(cfg['paths']['feature_store'])
+        self.watermark = store.watermark
+        self.recent = self.train_assigned
+        if self.watermark is not None:
+            newer = self.train_assigned.loc[self.train_assigned['date'] > self.watermark, store.SHIFT_COLS]
+            self.recent = pd.concat([store.recent_shifts(), newer], ignore_index=True)
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.startup_s = time.perf_counter() - start
+        print(f"[service] Loaded GAT v{self.model_version}, {len(self.nurses)} nurses, "
+              f"{len(self.recent)} recent shifts in {self.startup_s:.2f}s")
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'model_version': self.model_version,
+            'watermark': None if self.watermark is None else str(self.watermark.date()),
+            'in_flight': self._in_flight,
+            'capacity': self.workers + self.max_queue,
+        }
+
+    def candidates(self, payload):
+        """Candidate rows from payload['candidates'] (nurse_id + shift columns) or payload['preferences']."""
+        if 'candidates' in payload:
+            candidate_df = pd.DataFrame(payload['candidates'])
+            if 'is_preferred' not in candidate_df.columns:
+                candidate_df['is_preferred'] = 0
+            candidate_df['label'] = 0
+        elif 'preferences' in payload:
+            pref_df = pd.DataFrame(payload['preferences']).rename(
+                columns={'preferred_shift': 'shift', 'preferred_ward': 'ward'})
+            candidate_df = generate_candidates(payload.get('nurses', self.nurses), pref_df)
+        else:
+            raise ValueError("Request needs 'candidates' or 'preferences'")
+        missing = [col for col in ['nurse_id'] + SHIFT_COLS if col not in candidate_df.columns]
+        if missing:
+            raise ValueError(f"Candidate rows are missing columns: {missing}")
+        candidate_df['date'] = pd.to_datetime(candidate_df['date'])
+        return candidate_df.reset_index(drop=True)
+
+    def score(self, payload):
+        """Scored edge list (attach_edge_mappings columns plus is_preferred) for the request's candidates."""
+        candidate_df = self.candidates(payload)
+        # Rows after the watermark only need the preloaded tail; older rows use full history
+        after = self.watermark is not None and bool((candidate_df['date'] > self.watermark).all())
+        candidate_df = add_history_features(candidate_df, self.recent if after else self.train_assigned)
+
+        graph, maps = build_graph(candidate_df, **self.vocab)
+        with torch.no_grad():
+            scores = predict_gat(self.model, graph)
+        edges = pd.DataFrame(graph.edge_index.numpy().T, columns=['nurse_node', 'shift_node'])
+        edges['gat_score'] = scores
+        edges = attach_edge_mappings(edges, maps['nurse'], maps['shift'])
+        edges['is_preferred'] = candidate_df['is_preferred'].to_numpy()
+        return edges
+
+    def solve(self, payload):
+        """Score the request's candidates and solve; payload may override solver settings."""
+        edges = self.score(payload)
+        options = payload.get('options', {})
+        assignment, stats = optimize_assignment(
+            edges,
+            hours_per_fortnight=options.get('hours_per_fortnight', self.cfg['hours_per_fortnight']),
+            ward_requirements=options.get('ward_requirements', self.cfg.get('ward_requirements')),
+            backend=options.get('backend', self.cfg['solver']['backend']),
+            time_limit_s=options.get('time_limit_s', self.cfg['solver']['time_limit_s']),
+            num_workers=options.get('num_workers', self.cfg['solver']['num_workers']),
+            preference_weight=options.get('preference_weight', self.cfg.get('preference_weight', 0.0))
+        )
+        return assignment, stats
+
+    def submit(self, fn, *args):
+        """Run fn on the worker pool and wait for it; raises ServiceBusy when at capacity."""
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+def _records(df):
+    """JSON-ready list of row dicts with ISO dates."""
+    if df is None:
+        return None
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    return json.loads(df.to_json(orient='records'))
+
+class SchedulerHandler(BaseHTTPRequestHandler):
+    """
+    GET /health, POST /score and POST /solve with a JSON body:
+      {"candidates": [{nurse_id, date, shift, ward, start_time, end_time, duration_hours}, ...]}
+    or {"preferences": [preference.csv rows], "nurses": [...] (optional)}; /solve also takes
+    "options" overriding hours_per_fortnight, ward_requirements, preference_weight, backend,
+    time_limit_s and num_workers. Returns 503 with Retry-After when the service is at capacity.
+    """
+    service = None
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.service.health())
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        handlers = {'/score': self._score, '/solve': self._solve}
+        if self.path not in handlers:
+            self._send(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            start = time.perf_counter()
+            body = self.service.submit(handlers[self.path], payload)
+            body['elapsed_s'] = time.perf_counter() - start
+            self._send(200, body)
+        except ServiceBusy:
+            self._send(503, {'error': "Scheduler busy, retry later"}, {"Retry-After": "1"})
+        except (ValueError, KeyError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            # Bad payload shapes/types or solver failures: answer instead of dropping the connection
+            traceback.print_exc()
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def _score(self, payload):
+        return {'edges': _records(self.service.score(payload))}
+
+    def _solve(self, payload):
+        assignment, stats = self.service.solve(payload)
+        return {'assignment': _records(assignment), 'stats': stats}
+
+def serve(cfg, host="127.0.0.1", port=8080, workers=4, max_queue=8):
+    """Load the service once and answer HTTP requests until interrupted."""
+    SchedulerHandler.service = SchedulerService(cfg, workers=workers, max_queue=max_queue)
+    server = ThreadingHTTPServer((host, port), SchedulerHandler)
+    print(f"[service] Listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        SchedulerHandler.service.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="config.yaml")
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        cfg = yaml.safe_load(f)
+    service_cfg = cfg.get('service', {})
+    serve(
+        cfg,
+        host=service_cfg.get('host', "127.0.0.1"),
+        port=service_cfg.get('port', 8080),
+        workers=service_cfg.get('workers', 4),
+        max_queue=service_cfg.get('max_queue', 8)
+    )
+
+if __name__ == "__main__":
+    main()
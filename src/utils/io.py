@@ -0,0 +1,49 @@
+# src/utils/io.py
+
+import os
+
+import pandas as pd
+
+# Low-cardinality identifier columns stored as categoricals in columnar files
+CATEGORICAL_COLUMNS = ['nurse_id', 'ward', 'shift']
+FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.csv': 'csv'}
+
+def table_format(path):
+    """'parquet', 'feather' or 'csv' from the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported table format {ext!r} for {path} (expected one of {sorted(FORMATS)})")
+    return FORMATS[ext]
+
+def with_table_dtypes(df):
+    """Copy of df with explicit dtypes: categorical ids and datetime64 dates."""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def write_table(df, path):
+    """
+    Persist a stage output. Parquet and Feather keep the dtypes from with_table_dtypes, so
+    reading back needs no parsing or dtype inference; CSV is a plain export for the UI.
+    """
+    fmt = table_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        with_table_dtypes(df).to_parquet(path, index=False)
+    else:
+        with_table_dtypes(df).reset_index(drop=True).to_feather(path)
+    return path
+
+def read_table(path):
+    """Read a table written by write_table (or any CSV, whose dtypes are inferred as before)."""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
@@ -0,0 +1,151 @@
+# src/utils/profiling.py
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Solver stats copied into the stage record of any stage that returns a stats dict, so
+# jsonl/Prometheus show status, objective and timing per solve without the nested per-block
+# or per-window lists. Monolithic solves fill the first line (model size, build/solve time,
+# gap). Decomposed and rolling-horizon runs report the same keys as each other: status,
+# objective, hours_shortfall and wall_time_s, plus their block or window counts.
+SOLVER_FIELDS = [
+    'backend', 'status', 'objective', 'num_variables', 'num_constraints', 'build_time_s', 'solve_time_s', 'gap',
+    'split_by', 'num_blocks', 'num_resolved', 'max_block_solve_s', 'num_windows', 'max_window_rows',
+    'hours_shortfall', 'wall_time_s',
+]
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far in MB (None where resource is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def describe_outputs(outputs):
+    """Row, edge and node counts of the DataFrames, arrays and graphs in a stage's outputs."""
+    counts = {}
+    for name, value in outputs.items():
+        if isinstance(value, pd.DataFrame):
+            counts[f'{name}_rows'] = len(value)
+        elif isinstance(value, np.ndarray):
+            counts[f'{name}_rows'] = int(value.shape[0])
+        elif hasattr(value, 'edge_index') and hasattr(value, 'num_nodes'):
+            counts[f'{name}_edges'] = int(value.edge_index.size(1))
+            counts[f'{name}_nodes'] = int(value.num_nodes)
+        elif isinstance(value, dict) and 'status' in value and 'objective' in value:
+            # Solver stats: every solve mode reports at least status and objective
+            counts.update({field: value[field] for field in SOLVER_FIELDS if field in value})
+    return counts
+
+class StageProfiler:
+    """
+    Records wall time, CPU time and memory per pipeline stage, plus whatever counts the
+    caller adds to the record (rows, edges, solver stats). Each record is appended to
+    jsonl_path as one JSON line; prometheus_text() renders the latest record per stage in
+    the Prometheus text format (written to prometheus_path by write_prometheus()).
+
+    Memory comes from ru_maxrss, a process-wide high-water mark: process_peak_rss_mb is that
+    mark after the stage, and peak_rss_growth_mb how far the stage raised it (0 when the
+    stage stayed below the peak of an earlier one).
+
+    profile_stage runs that one stage under cProfile: stats go to
+    {profile_dir}/{stage}.prof (open with snakeviz or pstats) and the top functions are
+    printed. Every stage start is also logged with the pid, for attaching py-spy instead.
+    """
+    def __init__(self, jsonl_path=None, prometheus_path=None, profile_stage=None, profile_dir="data/profiles"):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, **fields):
+        record = {'stage': name, 'pid': os.getpid(), 'started_at': time.time(), **fields}
+        profiler = None
+        print(f"[profiling] {name}: start (pid {os.getpid()})")
+        if name == self.profile_stage:
+            print(f"[profiling] {name}: cProfile on")
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall, cpu, peak = time.perf_counter(), time.process_time(), peak_rss_mb()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['process_peak_rss_mb'] = peak_rss_mb()
+            record['peak_rss_growth_mb'] = None if peak is None else record['process_peak_rss_mb'] - peak
+            if profiler is not None:
+                profiler.disable()
+                record['profile'] = self._dump_profile(name, profiler)
+            self._emit(record)
+
+    def _dump_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(20)
+        print(summary.getvalue())
+        print(f"[profiling] {name}: profile saved to {path}")
+        return path
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.jsonl_path:
+            if os.path.dirname(self.jsonl_path):
+                os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def prometheus_text(self, prefix="nurse_scheduler_stage"):
+        """Gauges for every numeric field of the latest record per stage."""
+        latest = {record['stage']: record for record in self.records}
+        lines = []
+        metrics = {}
+        for stage, record in latest.items():
+            for field, value in record.items():
+                if field in ('pid', 'started_at') or isinstance(value, bool):
+                    continue
+                if isinstance(value, (int, float, np.integer, np.floating)):
+                    metrics.setdefault(field, []).append((stage, value))
+        for field, samples in metrics.items():
+            lines.append(f"# TYPE {prefix}_{field} gauge")
+            lines.extend(f'{prefix}_{field}{{stage="{stage}"}} {float(value)}' for stage, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """Write prometheus_text() to prometheus_path (e.g. for a node_exporter textfile collector)."""
+        if not self.prometheus_path:
+            return None
+        if os.path.dirname(self.prometheus_path):
+            os.makedirs(os.path.dirname(self.prometheus_path), exist_ok=True)
+        with open(self.prometheus_path, 'w') as f:
+            f.write(self.prometheus_text())
+        return self.prometheus_path
+
+    def summary(self):
+        """One line per recorded stage: wall, CPU, process peak RSS and the stage's growth of it."""
+        for record in self.records:
+            rss = "n/a"
+            if record['process_peak_rss_mb'] is not None:
+                rss = f"{record['process_peak_rss_mb']:.0f} MB (+{record['peak_rss_growth_mb']:.0f})"
+            cached = " (cached)" if record.get('cached') else ""
+            print(f"[profiling] {record['stage']:<12} wall {record['wall_s']:7.2f}s  "
+                  f"cpu {record['cpu_s']:7.2f}s  process peak rss {rss}{cached}")
@@ -0,0 +1,143 @@
+# src/utils/synthetic.py
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Shift types and their start/end variants as they appear in data/combined.csv
+SHIFT_TEMPLATES = {
+    'AM': [('07:00', '15:00', 8)],
+    'PM': [('15:00', '23:00', 8)],
+    'Night': [('20:00', '08:00', 12)],
+    'Flex1': [(f'{h:02d}:00', f'{h + 4:02d}:00', 4) for h in range(7, 15)],
+    'Flex2': [(f'{h:02d}:00', f'{h + 5:02d}:00', 5) for h in range(7, 14)],
+    'Flex3': [(f'{h:02d}:00', f'{h + 6:02d}:00', 6) for h in range(7, 13)],
+    'Flex4': [('12:00', '19:00', 7)],
+    'Flex5': [(f'{h:02d}:00', f'{h + 8:02d}:00', 8) for h in range(7, 11)],
+    'Flex6': [('07:00', '19:00', 12)],
+}
+DEFAULT_WARDS = ('A', 'B', 'C', 'ICU')
+COMBINED_COLUMNS = ['nurse_id', 'date', 'ward', 'shift', 'duration_hours', 'week', 'start_time', 'end_time', 'label']
+PREFERENCE_COLUMNS = ['nurse_id', 'date', 'preferred_shift', 'preferred_ward', 'duration_hours', 'start_time', 'end_time']
+
+def ward_names(wards):
+    """Ward names from a sequence of names or a count (W01, W02, ...)."""
+    if isinstance(wards, (int, np.integer)):
+        width = max(2, len(str(wards)))
+        return [f"W{i:0{width}d}" for i in range(1, wards + 1)]
+    return list(wards)
+
+def shift_templates(shift_types=None):
+    """One row per (shift, start_time, end_time, duration_hours) variant of the chosen shift types."""
+    shift_types = list(SHIFT_TEMPLATES) if shift_types is None else list(shift_types)
+    unknown = sorted(set(shift_types) - set(SHIFT_TEMPLATES))
+    if unknown:
+        raise ValueError(f"Unknown shift types {unknown} (expected some of {list(SHIFT_TEMPLATES)})")
+    return pd.DataFrame(
+        [(shift, *variant) for shift in shift_types for variant in SHIFT_TEMPLATES[shift]],
+        columns=['shift', 'start_time', 'end_time', 'duration_hours']
+    )
+
+def _sample_rows(rng, nurse_pos, day_pos, nurses, wards, templates, start):
+    """Shift rows for the given (nurse, day) positions with a random ward and shift variant each."""
+    n = len(nurse_pos)
+    # Shift types are equally likely; variants of one type share its probability
+    variants = templates.groupby('shift', sort=False)['shift'].transform('size').to_numpy()
+    template_pos = rng.choice(len(templates), n, p=(1 / variants) / (1 / variants).sum())
+    rows = templates.iloc[template_pos].reset_index(drop=True)
+    rows.insert(0, 'ward', np.asarray(wards, dtype=object)[rng.integers(0, len(wards), n)])
+    rows.insert(0, 'date', pd.Timestamp(start) + pd.to_timedelta(day_pos, unit='D'))
+    rows.insert(0, 'nurse_id', nurses[nurse_pos])
+    return rows
+
+def generate_roster(
+    n_nurses=40,
+    wards=DEFAULT_WARDS,
+    shift_types=None,
+    history_days=70,
+    horizon_days=28,
+    work_rate=0.7,
+    preference_density=1.0,
+    start='2025-06-30',
+    seed=0
+):
+    """
+    Seeded synthetic roster in the schema of data/combined.csv and data/preference.csv.
+
+    history_days of worked shifts (label=1) start on `start`: each nurse works a given day
+    with probability work_rate, on a random ward and shift variant. The horizon_days after
+    that hold the preferences: each nurse states one preference per day with probability
+    preference_density; they are also appended to combined_df with label=0, as in the real
+    data. wards is a list of names or a count; shift_types a subset of SHIFT_TEMPLATES.
+    The defaults match the size and shape of the shipped data.
+    Returns (combined_df, pref_df) with datetime dates.
+    """
+    rng = np.random.default_rng(seed)
+    width = max(3, len(str(n_nurses)))
+    nurses = np.array([f"N{i:0{width}d}" for i in range(1, n_nurses + 1)], dtype=object)
+    wards = ward_names(wards)
+    templates = shift_templates(shift_types)
+    start = pd.Timestamp(start)
+
+    # Worked history: a Bernoulli draw per (nurse, day), day-major like combined.csv
+    worked = rng.random((history_days, n_nurses)) < work_rate
+    day_pos, nurse_pos = np.nonzero(worked)
+    history = _sample_rows(rng, nurse_pos, day_pos, nurses, wards, templates, start)
+    history = history.sort_values(['date', 'ward', 'shift', 'nurse_id'], kind='stable')
+    history['label'] = 1
+
+    # Preferences for the horizon, nurse-major like preference.csv
+    stated = rng.random((n_nurses, horizon_days)) < preference_density
+    nurse_pos, day_pos = np.nonzero(stated)
+    prefs = _sample_rows(rng, nurse_pos, day_pos + history_days, nurses, wards, templates, start)
+    prefs['label'] = 0
+
+    combined_df = pd.concat([history, prefs], ignore_index=True)
+    combined_df['week'] = combined_df['date'].dt.isocalendar().week.astype(int)
+    pref_df = prefs.rename(columns={'shift': 'preferred_shift', 'ward': 'preferred_ward'})
+    return combined_df[COMBINED_COLUMNS], pref_df[PREFERENCE_COLUMNS].reset_index(drop=True)
+
+def write_roster(combined_df, pref_df, out_dir):
+    """Write combined.csv and preference.csv to out_dir; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    combined_path = os.path.join(out_dir, "combined.csv")
+    pref_path = os.path.join(out_dir, "preference.csv")
+    combined_df.to_csv(combined_path, index=False)
+    pref_df.to_csv(pref_path, index=False)
+    return combined_path, pref_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic combined.csv / preference.csv pair.")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--nurses", type=int, default=40)
+    parser.add_argument("--wards", nargs='+', default=list(DEFAULT_WARDS),
+                        help="ward names, or a single number of wards")
+    parser.add_argument("--shift-types", nargs='+', default=None, choices=list(SHIFT_TEMPLATES))
+    parser.add_argument("--history-days", type=int, default=70)
+    parser.add_argument("--horizon-days", type=int, default=28)
+    parser.add_argument("--work-rate", type=float, default=0.7)
+    parser.add_argument("--preference-density", type=float, default=1.0)
+    parser.add_argument("--start", default='2025-06-30')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    wards = int(args.wards[0]) if len(args.wards) == 1 and args.wards[0].isdigit() else args.wards
+    combined_df, pref_df = generate_roster(
+        n_nurses=args.nurses,
+        wards=wards,
+        shift_types=args.shift_types,
+        history_days=args.history_days,
+        horizon_days=args.horizon_days,
+        work_rate=args.work_rate,
+        preference_density=args.preference_density,
+        start=args.start,
+        seed=args.seed
+    )
+    paths = write_roster(combined_df, pref_df, args.out)
+    print(f"[synthetic] {len(combined_df)} combined rows ({(combined_df['label'] == 1).sum()} worked), "
+          f"{len(pref_df)} preferences -> {paths}")
+
+if __name__ == "__main__":
+    main()